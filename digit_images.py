@@ -5,235 +5,258 @@ Creates clean, printer-friendly digit images that render reliably on thermal pri
 """
 
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import io
 import os
+import re
+import struct
 import tempfile
 
+# Everything that is not an ASCII digit
+_NON_DIGIT_RE = re.compile(r'[^0-9]+')
+
+# ESC/POS "GS v 0" print raster bit image, normal density
+GS_V0 = b'\x1d\x76\x30\x00'
+
+# Drawing recipe for each digit. Each op is (primitive, box, *args); see
+# _DRAW_PRIMITIVES below. Box coordinates name anchor points of the glyph tile,
+# resolved to pixels per renderer by _anchor_points():
+#   b / e    the border and the far edge (side - border)
+#   b2 / e2  twice the border in from either side
+#   c        the tile centre
+#   cb / ce  the centre moved half a border towards the top / bottom edge
+#   q        a quarter of the digit height below the border
+#   sl / sr  the border and far edge moved half a stroke inwards
+DIGIT_OPS = {
+    '0': (
+        ("ell", ('b', 'b', 'e', 'e')),
+    ),
+    '1': (
+        ("line", ('c', 'b', 'c', 'e'), 2),  # Double-width vertical line
+    ),
+    '2': (
+        ("arc", ('b', 'b', 'e', 'c'), 180, 0),  # Top semicircle
+        ("line", ('e', 'c', 'b', 'e')),         # Diagonal line
+        ("line", ('b', 'e', 'e', 'e')),         # Bottom line
+    ),
+    '3': (
+        ("arc", ('b', 'b', 'e', 'c'), 180, 0),  # Top semicircle
+        ("arc", ('b', 'c', 'e', 'e'), 0, 180),  # Bottom semicircle
+    ),
+    '4': (
+        ("line", ('e2', 'b', 'e2', 'e')),  # Vertical line (right)
+        ("line", ('b', 'c', 'e', 'c')),    # Horizontal middle line
+        ("line", ('b2', 'b', 'b2', 'c')),  # Vertical line (left, top half)
+    ),
+    '5': (
+        ("line", ('b', 'b2', 'e', 'b2')),       # Top horizontal line
+        ("line", ('b', 'b2', 'b', 'c')),        # Left vertical line (top half)
+        ("line", ('b', 'c', 'e', 'c')),         # Middle horizontal line
+        ("arc", ('b', 'c', 'e', 'e'), 0, 180),  # Bottom semicircle
+    ),
+    '6': (
+        ("arc", ('b', 'b', 'e', 'e'), 0, 360),  # Full shape
+        ("line", ('sl', 'q', 'sl', 'e')),       # Vertical line on left
+    ),
+    '7': (
+        ("line", ('b', 'b2', 'e', 'b2')),  # Top horizontal line
+        ("line", ('e2', 'b2', 'c', 'e')),  # Diagonal line
+    ),
+    '8': (
+        ("ell", ('b', 'b', 'e', 'ce')),  # Two stacked circles
+        ("ell", ('b', 'cb', 'e', 'e')),
+    ),
+    '9': (
+        ("arc", ('b', 'b', 'e', 'e'), 0, 360),  # Full shape
+        ("line", ('sr', 'q', 'sr', 'e')),       # Vertical line on right
+    ),
+}
+
+def _anchor_points(digit_size, stroke):
+    """Pixel positions of the DIGIT_OPS anchor names for one glyph size and stroke"""
+    border = digit_size // 10
+    side = digit_size + border*2
+    center = side // 2
+    height = digit_size - border*2
+    return {
+        'b': border,
+        'e': side - border,
+        'b2': border*2,
+        'e2': side - border*2,
+        'c': center,
+        'cb': center - border//2,
+        'ce': center + border//2,
+        'q': border + height//4,
+        'sl': border + stroke//2,
+        'sr': side - border - stroke//2,
+    }
+
+def _draw_line(draw, box, stroke, weight=1):
+    draw.line(box, fill=0, width=stroke * weight)
+
+def _draw_arc(draw, box, stroke, start, end):
+    draw.arc(box, start, end, fill=0, width=stroke)
+
+def _draw_ellipse(draw, box, stroke):
+    draw.ellipse(box, outline=0, width=stroke)
+
+_DRAW_PRIMITIVES = {
+    "line": _draw_line,
+    "arc": _draw_arc,
+    "ell": _draw_ellipse,
+}
+
 class DigitRenderer:
     def __init__(self, digit_size=80, spacing=10, stroke_width=None):
         self.digit_size = digit_size
         self.spacing = spacing
         self.stroke_width = stroke_width or max(3, digit_size // 15)  # Default based on size
+        self._glyph_cache = {}  # digit -> uint8 array (0=black, 255=white)
+        
+        # Tile geometry and stroke are fixed per renderer, so resolve the recipes once
+        self._border = digit_size // 10
+        self._side = digit_size + self._border*2
+        points = _anchor_points(digit_size, self.stroke_width)
+        self._ops = {
+            digit: tuple(
+                (_DRAW_PRIMITIVES[kind], tuple(points[name] for name in box), args)
+                for kind, box, *args in ops
+            )
+            for digit, ops in DIGIT_OPS.items()
+        }
+        self._spacer = np.full((self._side, spacing), 255, np.uint8)
+        
+        # One 8-bit drawing buffer and Draw context for all digits
+        self._scratch = Image.new('L', (self._side, self._side), color=255)  # Cleared and reused for each digit
+        self._scratch_draw = ImageDraw.Draw(self._scratch)
+        
+        # Render every glyph up front so the first print doesn't pay for it
+        for digit in DIGIT_OPS:
+            self._glyph(digit)
         
     def create_digit(self, digit):
         """Create a single digit image"""
-        if not digit.isdigit() or len(digit) != 1:
+        if digit not in self._ops:
             return None
-            
-        # Create a white image with proper padding
-        border = self.digit_size // 10
-        img_size = (self.digit_size + border*2, self.digit_size + border*2)
-        img = Image.new('1', img_size, color=1)  # 1=white in binary mode
-        draw = ImageDraw.Draw(img)
+        return self._render_digit(digit).convert('1')
         
-        # Coordinates for drawing
-        cx, cy = img_size[0] // 2, img_size[1] // 2  # Center
-        width = self.digit_size - border*2
-        height = self.digit_size - border*2
+    def _render_digit(self, digit):
+        """Draw a digit into an 8-bit grayscale ('L') image"""
+        # Clear the scratch buffer to white (padding included) and draw into it
+        draw = self._scratch_draw
+        draw.rectangle((0, 0, self._side, self._side), fill=255)
         
-        # Draw based on digit value
-        digit_value = int(digit)
         stroke = self.stroke_width
+        for draw_op, box, args in self._ops[digit]:
+            draw_op(draw, box, stroke, *args)
         
-        if digit_value == 0:
-            # Draw a rounded rectangle/ellipse for zero
-            draw.ellipse(
-                (border, border, img_size[0]-border, img_size[1]-border),
-                outline=0,  # Black outline
-                width=stroke
-            )
-        elif digit_value == 1:
-            # Simple vertical line
-            line_x = cx
-            draw.line(
-                (line_x, border, line_x, img_size[1]-border),
-                fill=0,  # Black
-                width=stroke*2
-            )
-        elif digit_value == 2:
-            # Top semicircle
-            radius = width // 2
-            draw.arc(
-                (border, border, img_size[0]-border, cy),
-                180, 0,
-                fill=0,
-                width=stroke
-            )
-            # Diagonal line
-            draw.line(
-                (img_size[0]-border, cy, border, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
-            # Bottom line
-            draw.line(
-                (border, img_size[1]-border, img_size[0]-border, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 3:
-            # Top semicircle
-            draw.arc(
-                (border, border, img_size[0]-border, cy),
-                180, 0,
-                fill=0,
-                width=stroke
-            )
-            # Bottom semicircle
-            draw.arc(
-                (border, cy, img_size[0]-border, img_size[1]-border),
-                0, 180,
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 4:
-            # Vertical line (right)
-            draw.line(
-                (img_size[0]-border*2, border, img_size[0]-border*2, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
-            # Horizontal middle line
-            draw.line(
-                (border, cy, img_size[0]-border, cy),
-                fill=0,
-                width=stroke
-            )
-            # Vertical line (left, top half)
-            draw.line(
-                (border*2, border, border*2, cy),
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 5:
-            # Top horizontal line
-            draw.line(
-                (border, border*2, img_size[0]-border, border*2),
-                fill=0,
-                width=stroke
-            )
-            # Left vertical line (top half)
-            draw.line(
-                (border, border*2, border, cy),
-                fill=0,
-                width=stroke
-            )
-            # Middle horizontal line
-            draw.line(
-                (border, cy, img_size[0]-border, cy),
-                fill=0,
-                width=stroke
-            )
-            # Bottom semicircle
-            draw.arc(
-                (border, cy, img_size[0]-border, img_size[1]-border),
-                0, 180,
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 6:
-            # Full shape
-            draw.arc(
-                (border, border, img_size[0]-border, img_size[1]-border),
-                0, 360,
-                fill=0,
-                width=stroke
-            )
-            # Vertical line on left
-            draw.line(
-                (border+stroke//2, border+height//4, border+stroke//2, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 7:
-            # Top horizontal line
-            draw.line(
-                (border, border*2, img_size[0]-border, border*2),
-                fill=0,
-                width=stroke
-            )
-            # Diagonal line
-            draw.line(
-                (img_size[0]-border*2, border*2, cx, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
-        elif digit_value == 8:
-            # Draw two stacked circles
-            draw.ellipse(
-                (border, border, img_size[0]-border, cy+border//2),
-                outline=0,
-                width=stroke
-            )
-            draw.ellipse(
-                (border, cy-border//2, img_size[0]-border, img_size[1]-border),
-                outline=0,
-                width=stroke
-            )
-        elif digit_value == 9:
-            # Full shape
-            draw.arc(
-                (border, border, img_size[0]-border, img_size[1]-border),
-                0, 360,
-                fill=0,
-                width=stroke
-            )
-            # Vertical line on right
-            draw.line(
-                (img_size[0]-border-stroke//2, border+height//4, img_size[0]-border-stroke//2, img_size[1]-border),
-                fill=0,
-                width=stroke
-            )
+        return self._scratch.copy()
         
-        return img
+    def _glyph(self, digit):
+        """Return the cached uint8 array for a digit, rendering it on first use"""
+        glyph = self._glyph_cache.get(digit)
+        if glyph is None:
+            glyph = np.asarray(self._render_digit(digit))
+            self._glyph_cache[digit] = glyph
+        return glyph
         
-    def create_number(self, number_str):
-        """Create a complete number image from multiple digits"""
-        # Handle empty or non-numeric strings
-        if not number_str or not any(c.isdigit() for c in number_str):
-            number_str = "0"  # Default to 0 if no valid digits
+    def _number_array(self, number_str):
+        """Build the uint8 array (0=black, 255=white) for a number string"""
+        # Filter to digits only (queue numbers normally arrive clean)
+        if number_str and number_str.isascii() and number_str.isdigit():
+            digits = number_str
+        else:
+            digits = _NON_DIGIT_RE.sub('', number_str or '')
             
-        # Filter to digits only
-        digits = ''.join(c for c in number_str if c.isdigit())
+        # Handle empty or non-numeric strings
+        if not digits:
+            digits = "0"  # Default to 0 if no valid digits
         
-        # Create individual digit images
-        digit_images = [self.create_digit(d) for d in digits]
-        digit_images = [img for img in digit_images if img is not None]  # Filter any None results
+        # Look up cached glyph arrays
+        glyphs = [self._glyph(d) for d in digits]
         
-        if not digit_images:
+        if not glyphs:
             return None
             
-        # Calculate combined size
-        total_width = sum(img.width for img in digit_images) + self.spacing * (len(digit_images) - 1)
-        max_height = max(img.height for img in digit_images)
+        # Interleave glyphs with white spacers and join them in one pass
+        spacer = self._spacer
+        parts = []
+        for glyph in glyphs:
+            parts.append(glyph)
+            parts.append(spacer)
+        parts.pop()  # No spacer after the last digit
+        
+        return np.concatenate(parts, axis=1)
+        
+    def create_number(self, number_str):
+        """Create a complete number image from multiple digits"""
+        combined = self._number_array(number_str)
+        if combined is None:
+            return None
+        return Image.fromarray(combined)
         
-        # Create the combined image
-        result = Image.new('1', (total_width, max_height), color=1)  # White background
+    def create_number_mask(self, number_str):
+        """Create a mode '1' mask of a number, set where the digits are black"""
+        combined = self._number_array(number_str)
+        if combined is None:
+            return None
+        return Image.fromarray(combined < 128)
         
-        # Place each digit
-        x_position = 0
-        for img in digit_images:
-            result.paste(img, (x_position, 0))
-            x_position += img.width + self.spacing
+    def create_number_escpos(self, number_str):
+        """Create a number as a ready-to-send ESC/POS GS v 0 raster command"""
+        combined = self._number_array(number_str)
+        if combined is None:
+            return None
             
-        return result
+        # Printer bits are 1=black; packbits zero-pads each row to a full byte
+        bits = (combined < 128).astype(np.uint8)
+        raster = np.packbits(bits, axis=1)
+        height, width_bytes = raster.shape
+        return GS_V0 + struct.pack('<HH', width_bytes, height) + raster.tobytes()
         
-    def create_number_file(self, number_str, directory=None):
-        """Create a number image and save it to a temporary file"""
+    def create_number_buffer(self, number_str):
+        """Create a number image as an in-memory PNG (io.BytesIO positioned at 0)"""
         number_img = self.create_number(number_str)
         if not number_img:
             return None
             
+        # Fast, light compression - the image is consumed once by the printer
+        buf = io.BytesIO()
+        number_img.convert('1').save(buf, format='PNG', optimize=False, compress_level=1)
+        buf.seek(0)
+        return buf
+        
+    def create_number_file(self, number_str, directory=None):
+        """Create a number image and save it to a temporary file"""
+        buf = self.create_number_buffer(number_str)
+        if not buf:
+            return None
+            
         # Save to temp file
         fd, path = tempfile.mkstemp(suffix='.png', dir=directory)
-        os.close(fd)
-        number_img.save(path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buf.getbuffer())
         return path
 
+# Shared renderers keyed by (digit_size, spacing) so glyph caches stay warm
+_RENDERERS = {}
+
+def _get_renderer(digit_size, spacing):
+    """Return the shared renderer for a (digit_size, spacing) pair"""
+    key = (digit_size, spacing)
+    renderer = _RENDERERS.get(key)
+    if renderer is None:
+        renderer = _RENDERERS[key] = DigitRenderer(digit_size=digit_size, spacing=spacing)
+    return renderer
+
 # Convenience function for simple usage
 def create_number_image(number_str, digit_size=80, spacing=10):
     """Create a number image with default settings"""
-    renderer = DigitRenderer(digit_size=digit_size, spacing=spacing)
-    return renderer.create_number(number_str)
+    return _get_renderer(digit_size, spacing).create_number(number_str)
+
+def create_number_mask(number_str, digit_size=80, spacing=10):
+    """Create a 1-bit ink mask of a number, for pasting a fill colour through"""
+    return _get_renderer(digit_size, spacing).create_number_mask(number_str)
 
 # Test function to generate sample digit images
 def generate_samples():
@@ -257,263 +280,3 @@ def generate_samples():
 if __name__ == "__main__":
     # Test the digit renderer by generating samples
     generate_samples()
-"""
-Utility to create digit images for thermal printer
-This avoids font rendering issues by using pre-drawn digit shapes
-"""
-
-from PIL import Image, ImageDraw
-import tempfile
-import os
-
-def create_digit_image(digit, size=80, border=5):
-    """Create an image of a single digit with specified size"""
-    # Each digit is a white shape on black background
-    img_size = (size + border*2, size + border*2)
-    img = Image.new('1', img_size, color=1)  # 1=white in binary mode
-    draw = ImageDraw.Draw(img)
-    
-    # Stroke width
-    stroke = max(3, size // 15)
-    
-    # Calculate center and dimensions
-    cx, cy = size//2 + border, size//2 + border
-    width, height = size - border*2, size - border*2
-    
-    # Draw digit based on value
-    if digit == '0':
-        # Draw a rounded rectangle for zero
-        draw.rounded_rectangle(
-            (border + stroke, border + stroke, 
-             size + border - stroke, size + border - stroke),
-            radius=size//4,
-            fill=1,  # white
-            outline=0,  # black
-            width=stroke
-        )
-    elif digit == '1':
-        # Draw a vertical line for 1
-        middle_x = cx
-        draw.rectangle(
-            (middle_x - stroke//2, border, 
-             middle_x + stroke//2, size + border),
-            fill=0  # black
-        )
-    elif digit == '2':
-        # Top arc
-        draw.arc(
-            (border, border, 
-             size + border, size + border),
-            180, 0,  # Top half circle
-            fill=0,  # black
-            width=stroke
-        )
-        # Bottom diagonal line
-        draw.line(
-            (border, cy, size + border, size + border),
-            fill=0,  # black
-            width=stroke
-        )
-        # Bottom line
-        draw.line(
-            (border, size + border, size + border, size + border),
-            fill=0,  # black
-            width=stroke
-        )
-    elif digit == '3':
-        # Draw a 3 shape: top and bottom rounded parts
-        # Top semicircle
-        draw.arc(
-            (border, border,
-             size + border, cy),
-            180, 0,
-            fill=0,
-            width=stroke
-        )
-        # Bottom semicircle
-        draw.arc(
-            (border, cy,
-             size + border, size + border),
-            0, 180,
-            fill=0,
-            width=stroke
-        )
-    elif digit == '4':
-        # Vertical line on right
-        draw.line(
-            (size + border - stroke, border, size + border - stroke, size + border),
-            fill=0,
-            width=stroke
-        )
-        # Horizontal line in middle
-        draw.line(
-            (border, cy, size + border, cy),
-            fill=0,
-            width=stroke
-        )
-        # Diagonal line on left
-        draw.line(
-            (border, border, size + border - stroke, cy),
-            fill=0,
-            width=stroke
-        )
-    elif digit == '5':
-        # Top horizontal line
-        draw.line(
-            (border, border, size + border, border),
-            fill=0,
-            width=stroke
-        )
-        # Left vertical line (top half)
-        draw.line(
-            (border, border, border, cy),
-            fill=0,
-            width=stroke
-        )
-        # Middle horizontal line
-        draw.line(
-            (border, cy, size + border, cy),
-            fill=0,
-            width=stroke
-        )
-        # Bottom arc
-        draw.arc(
-            (border, cy,
-             size + border, size + border),
-            0, 180,
-            fill=0,
-            width=stroke
-        )
-    elif digit == '6':
-        # Top arc
-        draw.arc(
-            (border, border,
-             size + border, cy),
-            180, 0,
-            fill=0,
-            width=stroke
-        )
-        # Left vertical line
-        draw.line(
-            (border, border, border, size + border),
-            fill=0,
-            width=stroke
-        )
-        # Bottom circle
-        draw.ellipse(
-            (border, cy,
-             size + border, size + border),
-            outline=0,
-            width=stroke
-        )
-    elif digit == '7':
-        # Top horizontal line
-        draw.line(
-            (border, border, size + border, border),
-            fill=0,
-            width=stroke
-        )
-        # Diagonal line
-        draw.line(
-            (size + border, border, border + size//2, size + border),
-            fill=0,
-            width=stroke
-        )
-    elif digit == '8':
-        # Draw two circles for 8
-        draw.ellipse(
-            (border, border,
-             size + border, cy),
-            outline=0,
-            width=stroke
-        )
-        draw.ellipse(
-            (border, cy - stroke//2,
-             size + border, size + border),
-            outline=0,
-            width=stroke
-        )
-    elif digit == '9':
-        # Top circle
-        draw.ellipse(
-            (border, border,
-             size + border, cy),
-            outline=0,
-            width=stroke
-        )
-        # Right vertical line
-        draw.line(
-            (size + border, border, size + border, size + border),
-            fill=0,
-            width=stroke
-        )
-        # Bottom arc
-        draw.arc(
-            (border, cy,
-             size + border, size + border),
-            0, 90,
-            fill=0,
-            width=stroke
-        )
-    
-    return img
-
-def create_number_image(number_str, digit_size=80, spacing=10):
-    """Create an image with multiple digits for a number"""
-    if not number_str:
-        return None
-        
-    # Handle non-digit characters
-    digits = ''.join(c for c in number_str if c.isdigit())
-    if not digits:
-        return None
-    
-    # Create individual digit images
-    digit_images = [create_digit_image(d, size=digit_size) for d in digits]
-    
-    # Calculate total width and height
-    total_width = sum(img.width for img in digit_images) + spacing * (len(digit_images) - 1)
-    max_height = max(img.height for img in digit_images)
-    
-    # Create a new image to hold all digits
-    combined = Image.new('1', (total_width, max_height), color=1)  # 1=white
-    
-    # Paste each digit image
-    x_offset = 0
-    for img in digit_images:
-        combined.paste(img, (x_offset, 0))
-        x_offset += img.width + spacing
-    
-    return combined
-
-def save_digit_demo():
-    """Create a demo image with all digits"""
-    # Create images for all digits
-    all_digits = "0123456789"
-    images = [create_digit_image(d, size=50) for d in all_digits]
-    
-    # Create a row of all digits
-    width = sum(img.width for img in images) + 10 * (len(images) - 1)
-    height = max(img.height for img in images)
-    
-    demo = Image.new('1', (width, height), color=1)
-    
-    x = 0
-    for img in images:
-        demo.paste(img, (x, 0))
-        x += img.width + 10
-        
-    # Save the demo
-    demo.save("digit_demo.png")
-    print("Saved digit demo to digit_demo.png")
-    
-    # Test numbers
-    test_numbers = ["123", "456", "789", "42", "007"]
-    for num in test_numbers:
-        img = create_number_image(num)
-        filename = f"number_{num}.png"
-        img.save(filename)
-        print(f"Saved {filename}")
-
-if __name__ == "__main__":
-    save_digit_demo()
@@ -12,34 +12,42 @@ import sys
 import os
 import platform
 import subprocess
-from PyQt5.QtCore import Qt, QUrl, QTimer
-from PyQt5.QtWidgets import QApplication, QMainWindow, QShortcut
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
+import functools
+import json
+import re
+import struct
+import logging
+import logging.handlers
+import queue
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from PyQt5.QtCore import (Qt, QUrl, QTimer, QRunnable, QThreadPool, QMetaObject,
+                          Q_ARG, pyqtSlot)
+from PyQt5.QtWidgets import QApplication, QMainWindow
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEngineProfile, QWebEngineScript
 from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 
 # Import the digit image generator
 try:
-    from digit_images import create_number_image
+    from digit_images import create_number_mask
     CUSTOM_DIGIT_RENDERING = True
-    print("Custom digit rendering available")
 except ImportError:
-    print("Custom digit rendering not available, using fonts instead")
     CUSTOM_DIGIT_RENDERING = False
 
 # Import our thermal printer module and PIL for image rendering
 try:
     from thermal_printer import get_printer
+    import PIL
     from PIL import Image, ImageDraw, ImageFont
-    from thai_receipt import ThaiReceiptGenerator
-    import tempfile
-    import os
+    import numpy as np
+    from thai_receipt import ThaiReceiptGenerator, format_waiting_count
     DIRECT_THERMAL_PRINTING = True
-    print("Thermal printer module loaded successfully")
+    _PRINTER_IMPORT_ERROR = None
 except ImportError as e:
-    print(f"Thermal printer module or PIL not found: {e}, falling back to CUPS printing")
     DIRECT_THERMAL_PRINTING = False
+    # Reported once logging is set up in main()
+    _PRINTER_IMPORT_ERROR = e
 
 # Import configuration
 try:
@@ -55,16 +63,220 @@ except ImportError:
     BROWSER_HEIGHT = 800
     DEV_MODE = True
     EXIT_SHORTCUT_ENABLED = True
+    CHROMIUM_FLAGS = "--enable-gpu-rasterization --ignore-gpu-blocklist --disable-features=CalculateNativeWinOcclusion"
+    ALLOWED_HOSTS = ()
+
+# Application logger; handlers are attached in main()
+log = logging.getLogger("kiosk")
+# Per-print debug traces are only emitted in development mode
+log.setLevel(logging.DEBUG if DEV_MODE else logging.INFO)
+
+# ESC/POS "GS v 0" raster bit image command, normal density
+GS_V0 = b'\x1d\x76\x30\x00'
+
+# Number of rendered receipt images kept for reuse
+RECEIPT_CACHE_SIZE = 8
 
 # Platform detection
 IS_WINDOWS = platform.system() == "Windows"
 IS_LINUX = platform.system() == "Linux"
 
+# Patterns used to pull queue details out of the page content
+_RE_NUMBERSHOW = re.compile(r'numbershow[^:]*:[^"]*"(\d+)"')
+_RE_WS_NUM = re.compile(r'\s(\d{1,3})\s')
+_RE_WB_NUM = re.compile(r'\b(\d{1,3})\b')
+_RE_DATE = re.compile(r'(\d{1,2}/\d{1,2}/\s*\d{1,2}:\d{1,2})')
+_RE_THAI_WAIT = re.compile(r'รอ(\d+)คิว')
+_RE_DIFF = re.compile(r'difference[^:]*:\s*(\d+)')
+_RE_THAI_WAIT_LOOSE = re.compile(r'รอ\s*(\d+)')
+
+# Renderer-side version of _extract_queue_info: runs the same lookups against
+# the page text and returns only the resulting fields as JSON
+_QUEUE_INFO_JS = r"""
+(function () {
+    var text = document.body ? document.body.innerText : '';
+    function find(re) {
+        var m = re.exec(text);
+        return m ? m[1] : null;
+    }
+    
+    // Prefer the Vue component's numbershow value when it is reachable
+    var root = document.querySelector('#app');
+    var vm = root && root.__vue__;
+    var queue = (vm && vm.numbershow != null) ? String(vm.numbershow) :
+        (find(/numbershow[^:]*:[^"]*"(\d+)"/) || find(/\s(\d{1,3})\s/) ||
+         find(/\b(\d{1,3})\b/) || '0');
+    
+    // Waiting count: Thai text, then difference field, then queue number - 1
+    var wait = find(/รอ(\d+)คิว/) || find(/difference[^:]*:\s*(\d+)/);
+    return JSON.stringify({
+        queue_number: queue,
+        timestamp: find(/(\d{1,2}\/\d{1,2}\/\s*\d{1,2}:\d{1,2})/) || '',
+        waiting_count: wait !== null ? parseInt(wait, 10) : Math.max((parseInt(queue, 10) || 0) - 1, 0)
+    });
+})();
+"""
+
+# Autoplay header, built once instead of per intercepted request
+_AUTOPLAY_HDR = b"Autoplay-Policy"
+_AUTOPLAY_VAL = b"no-user-gesture-required"
+
+# Hosts the kiosk may load from; an empty set allows everything
+_ALLOWED_HOSTS = frozenset(host.lower() for host in ALLOWED_HOSTS)
+# Only network requests are checked; data:, blob:, qrc: and about: URLs have no host
+_NETWORK_SCHEMES = frozenset(("http", "https", "ws", "wss"))
+
+# Web engine attributes applied when autoplay is enabled
+_WEB_SETTINGS = (
+    (QWebEngineSettings.PlaybackRequiresUserGesture, False),
+    (QWebEngineSettings.AutoLoadImages, True),
+    (QWebEngineSettings.JavascriptEnabled, True),
+    (QWebEngineSettings.JavascriptCanOpenWindows, True),
+)
+
 class WebEngineUrlInterceptor(QWebEngineUrlRequestInterceptor):
     """Intercepts URL requests to modify headers for autoplay support"""
     def interceptRequest(self, info):
+        # Block requests to hosts outside the configured whitelist
+        if _ALLOWED_HOSTS:
+            url = info.requestUrl()
+            if url.scheme() in _NETWORK_SCHEMES and url.host().lower() not in _ALLOWED_HOSTS:
+                info.block(True)
+                return
         # Add headers to enable autoplay
-        info.setHttpHeader(b"Autoplay-Policy", b"no-user-gesture-required")
+        info.setHttpHeader(_AUTOPLAY_HDR, _AUTOPLAY_VAL)
+
+def _apply_autoplay_on(settings):
+    """Enable autoplay and the page features it relies on"""
+    for attribute, value in _WEB_SETTINGS:
+        settings.setAttribute(attribute, value)
+
+def _noop(*args):
+    pass
+
+def _apply_kiosk(window):
+    """Run the window frameless and fullscreen with keyboard shortcuts"""
+    # Shortcut classes are only needed in kiosk mode
+    from PyQt5.QtWidgets import QShortcut
+    from PyQt5.QtGui import QKeySequence
+    
+    window.setWindowFlags(Qt.Window | Qt.FramelessWindowHint)
+    window.showFullScreen()
+    
+    # Set up keyboard shortcuts
+    if EXIT_SHORTCUT_ENABLED:
+        window.exit_shortcut = QShortcut(QKeySequence("Ctrl+Alt+Q"), window)
+        window.exit_shortcut.activated.connect(window.close)
+        
+    # Add print shortcut (P key)
+    window.print_shortcut = QShortcut(QKeySequence("P"), window)
+    window.print_shortcut.activated.connect(window.print_page)
+    log.info("Press 'P' to print a receipt")
+
+def _apply_windowed(window):
+    """If not in kiosk mode, set a reasonable window size"""
+    window.resize(BROWSER_WIDTH, BROWSER_HEIGHT)
+
+# The config flags are fixed at import time, so pick the setup steps once
+_apply_autoplay = _apply_autoplay_on if ENABLE_AUTOPLAY else _noop
+_apply_window = _apply_kiosk if KIOSK_MODE else _apply_windowed
+
+def _extract_queue_info(html_content):
+    """Extract queue information from the HTML content"""
+    # This function extracts queue data from the page, including number, date, and waiting count
+    
+    # Print debug info about the HTML content
+    log.debug("HTML Content length: %s", len(html_content))
+    log.debug("HTML Content preview: %s...", html_content[:200])
+    
+    # Result dictionary to return
+    result = {
+        'queue_number': "0",
+        'timestamp': "",
+        'waiting_count': 0  # Default to 0
+    }
+    
+    # Look for a large number in the center of the page (likely the queue number)
+    # First try to find the numbershow in Vue.js data
+    queue_match = _RE_NUMBERSHOW.search(html_content)
+    if queue_match:
+        result['queue_number'] = queue_match.group(1)
+        log.debug("Found queue number from numbershow: %s", result['queue_number'])
+    else:
+        # Then try to find a number between 1-999 that's surrounded by whitespace
+        queue_match = _RE_WS_NUM.search(html_content)
+        if queue_match:
+            result['queue_number'] = queue_match.group(1)
+            log.debug("Found queue number from whitespace pattern: %s", result['queue_number'])
+        else:
+            # If that fails, look for any number
+            queue_match = _RE_WB_NUM.search(html_content)
+            if queue_match:
+                result['queue_number'] = queue_match.group(1)
+                log.debug("Found queue number from word boundary pattern: %s", result['queue_number'])
+    
+    # Extract date/time - looking for date format like "16/05/ 05:12"
+    date_match = _RE_DATE.search(html_content)
+    if date_match:
+        result['timestamp'] = date_match.group(1)
+    
+    # Extract waiting count from the Vue.js app html content
+    # PRIORITY 1: Look for Thai format "รอXคิว" which is the rendered content
+    try:
+        # First check for the Thai wait text which is most accurate
+        waiting_match = _RE_THAI_WAIT.search(html_content)
+        if waiting_match:
+            result['waiting_count'] = int(waiting_match.group(1))
+            log.debug("Found waiting count from Thai text: %s", result['waiting_count'])
+            
+        # PRIORITY 2: Look for difference in JSON format
+        else:    
+            difference_match = _RE_DIFF.search(html_content)
+            if difference_match:
+                result['waiting_count'] = int(difference_match.group(1))
+                log.debug("Found waiting count from difference field: %s", result['waiting_count'])
+                
+            # PRIORITY 3: Fallback to calculated value based on queue number
+            else:
+                queue_num = int(result['queue_number'])
+                # Standard logic: waiting count is queue_number - 1, with minimum of 0
+                if queue_num <= 1:
+                    result['waiting_count'] = 0
+                else:
+                    result['waiting_count'] = queue_num - 1
+                log.debug("Using calculated waiting count: %s (fallback only)", result['waiting_count'])
+    except Exception as e:
+        log.error("Error extracting waiting count: %s", e)
+        # Default to 0 if any error occurs
+        result['waiting_count'] = 0
+        
+        # Try a simpler regex as last resort
+        try:
+            # Super simplified pattern - just look for a digit after "รอ"
+            simple_match = _RE_THAI_WAIT_LOOSE.search(html_content)
+            if simple_match:
+                result['waiting_count'] = int(simple_match.group(1))
+                log.debug("Found waiting count with simplified pattern: %s", result['waiting_count'])
+        except:
+            pass
+    
+    return result
+
+class PrintJob(QRunnable):
+    """Renders and prints one receipt on a pool thread, then reports back to the UI thread"""
+    def __init__(self, browser, queue_info):
+        super().__init__()
+        self.browser = browser
+        self.queue_info = queue_info
+        
+    def run(self):
+        try:
+            success = self.browser.print_queue_receipt(self.queue_info)
+        except Exception as e:
+            log.exception("Error in print job: %s", e)
+            success = False
+        QMetaObject.invokeMethod(self.browser, "on_print_finished",
+                                 Qt.QueuedConnection, Q_ARG(bool, success))
 
 class KioskBrowser(QMainWindow):
     def __init__(self, url=DEFAULT_URL):
@@ -74,16 +286,36 @@ class KioskBrowser(QMainWindow):
         if AUTO_PRINT_ENABLED:
             self.setup_auto_print()
         
+        # Single worker so print jobs never share the USB printer concurrently
+        self._print_pool = QThreadPool(self)
+        self._print_pool.setMaxThreadCount(1)
+        
+        # Rendered receipt rasters keyed by their content, oldest first
+        self._receipt_cache = OrderedDict()
+        
         # Initialize Thai receipt generator
         if DIRECT_THERMAL_PRINTING:
             try:
                 self.thai_receipt_generator = ThaiReceiptGenerator()
-                print("Thai receipt generator initialized")
+                log.info("Thai receipt generator initialized")
             except Exception as e:
-                print(f"Error initializing Thai receipt generator: {e}")
+                log.error("Error initializing Thai receipt generator: %s", e)
                 self.thai_receipt_generator = None
         
     def init_ui(self):
+        # Keep the HTTP cache and site storage on disk so page reloads
+        # don't re-fetch scripts, fonts and audio
+        profile = QWebEngineProfile.defaultProfile()
+        profile.setCachePath(os.path.expanduser("~/.cache/kiosk"))
+        profile.setPersistentStoragePath(os.path.expanduser("~/.local/share/kiosk"))
+        profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+        profile.setHttpCacheMaximumSize(256 * 1024 * 1024)
+        profile.setPersistentCookiesPolicy(QWebEngineProfile.AllowPersistentCookies)
+        
+        # Install the autoplay request interceptor on the profile
+        self._interceptor = WebEngineUrlInterceptor(self)
+        profile.setUrlRequestInterceptor(self._interceptor)
+        
         # Create web view
         self.web_view = QWebEngineView()
         self.setCentralWidget(self.web_view)
@@ -92,29 +324,10 @@ class KioskBrowser(QMainWindow):
         settings = self.web_view.settings()
         
         # Enable autoplay
-        if ENABLE_AUTOPLAY:
-            settings.setAttribute(QWebEngineSettings.PlaybackRequiresUserGesture, False)
-            settings.setAttribute(QWebEngineSettings.AutoLoadImages, True)
-            settings.setAttribute(QWebEngineSettings.JavascriptEnabled, True)
-            settings.setAttribute(QWebEngineSettings.JavascriptCanOpenWindows, True)
-        
-        # Set up kiosk mode
-        if KIOSK_MODE:
-            self.setWindowFlags(Qt.Window | Qt.FramelessWindowHint)
-            self.showFullScreen()
-            
-            # Set up keyboard shortcuts
-            if EXIT_SHORTCUT_ENABLED:
-                self.exit_shortcut = QShortcut(QKeySequence("Ctrl+Alt+Q"), self)
-                self.exit_shortcut.activated.connect(self.close)
-                
-            # Add print shortcut (P key)
-            self.print_shortcut = QShortcut(QKeySequence("P"), self)
-            self.print_shortcut.activated.connect(self.print_page)
-            print("Press 'P' to print a receipt")
-        else:
-            # If not in kiosk mode, set a reasonable window size
-            self.resize(BROWSER_WIDTH, BROWSER_HEIGHT)
+        _apply_autoplay(settings)
+        
+        # Set up kiosk mode or a normal window
+        _apply_window(self)
         
         self.setWindowTitle("Kiosk Browser")
         
@@ -125,14 +338,99 @@ class KioskBrowser(QMainWindow):
     def setup_auto_print(self):
         """Set up auto-print functionality"""
         if AUTO_PRINT_INTERVAL > 0:
-            print(f"Setting up auto-print with interval: {AUTO_PRINT_INTERVAL}ms")
+            log.info("Setting up auto-print with interval: %sms", AUTO_PRINT_INTERVAL)
             self.print_timer = QTimer(self)
             self.print_timer.timeout.connect(self.print_page)
             self.print_timer.start(AUTO_PRINT_INTERVAL)
             
         # Add JavaScript bridge to enable printing from JavaScript
-        print("Setting up JavaScript print bridge...")
+        log.debug("Setting up JavaScript print bridge...")
         js_bridge_code = """
+        // Print as soon as the queue number on screen changes instead of guessing
+        // a settle delay. Only the element showing the number is watched, and a
+        // mutation counts only if the number differs from the one captured when
+        // the watch started, so ripples, spinners or clocks can't trigger a
+        // stale receipt. If the number never changes, print after maxWait anyway.
+        // A trigger during a running watch (the fetch after the click) extends
+        // its deadline rather than starting a second print.
+        var queueWatch = null;
+        function queueVm() {
+            var root = document.querySelector('#app');
+            return root && root.__vue__;
+        }
+        function readQueueNumber(node) {
+            var vm = queueVm();
+            if (vm && vm.numbershow != null) {
+                return String(vm.numbershow);
+            }
+            if (!node) {
+                return null;
+            }
+            // A replaced element means the number was re-rendered
+            return node.isConnected ? node.textContent.trim() : '';
+        }
+        function findQueueNode() {
+            // The element showing the queue number: the leaf whose text is the
+            // Vue numbershow value or, without Vue data, the 1-3 digit leaf
+            // drawn in the largest font
+            var root = document.querySelector('#app') || document.body;
+            var vm = queueVm();
+            var value = vm && vm.numbershow != null ? String(vm.numbershow) : null;
+            var best = null;
+            var bestSize = 0;
+            var elements = root.querySelectorAll('*');
+            for (var i = 0; i < elements.length; i++) {
+                if (elements[i].children.length !== 0) {
+                    continue;
+                }
+                var text = elements[i].textContent.trim();
+                if (value !== null) {
+                    if (text === value) {
+                        return elements[i];
+                    }
+                } else if (/^\\d{1,3}$/.test(text)) {
+                    var size = parseFloat(window.getComputedStyle(elements[i]).fontSize) || 0;
+                    if (!best || size > bestSize) {
+                        best = elements[i];
+                        bestSize = size;
+                    }
+                }
+            }
+            return best;
+        }
+        function printWhenUpdated(maxWait) {
+            if (queueWatch) {
+                clearTimeout(queueWatch.timer);
+                queueWatch.timer = setTimeout(queueWatch.fire, maxWait);
+                return;
+            }
+            var node = findQueueNode();
+            var before = readQueueNumber(node);
+            var watch = queueWatch = {timer: null, observer: null};
+            watch.fire = function() {
+                if (watch.observer) {
+                    watch.observer.disconnect();
+                }
+                clearTimeout(watch.timer);
+                if (queueWatch === watch) {
+                    queueWatch = null;
+                }
+                window.printReceipt();
+            };
+            // Without a number to compare, only the deadline can trigger the print
+            if (before !== null) {
+                // Watch the number's parent so a re-rendered replacement element is seen too
+                var target = (node && node.parentNode) || document.querySelector('#app') || document.body;
+                watch.observer = new MutationObserver(function() {
+                    if (readQueueNumber(node) !== before) {
+                        watch.fire();
+                    }
+                });
+                watch.observer.observe(target, {childList: true, subtree: true, characterData: true});
+            }
+            watch.timer = setTimeout(watch.fire, maxWait);
+        }
+        
         // Monitor button clicks for printing
         document.addEventListener('click', function(event) {
             if (event.target.tagName === 'BUTTON' || 
@@ -144,9 +442,7 @@ class KioskBrowser(QMainWindow):
                                    (event.target.closest('.v-btn') ? event.target.closest('.v-btn').textContent : '');
                 if (buttonText.includes('กดเรียกคิว') || buttonText.includes('เรียกคิว')) {
                     console.log('QUEUE_BUTTON_CLICKED');
-                    setTimeout(function() {
-                        window.printReceipt();
-                    }, 1000);
+                    printWhenUpdated(1000);
                 }
             }
         });
@@ -161,10 +457,8 @@ class KioskBrowser(QMainWindow):
                 promise.then(function() {
                     console.log('QUEUE_API_CALLED');
                     
-                    // Wait for the response to be processed and UI to update
-                    setTimeout(function() {
-                        window.printReceipt();
-                    }, 2500);  // Increased to 2.5 seconds for better reliability
+                    // Print once the response has been rendered
+                    printWhenUpdated(2500);
                 });
             }
             
@@ -181,10 +475,10 @@ class KioskBrowser(QMainWindow):
                 if (arguments[0] && arguments[0].includes('regisshow')) {
                     console.log('QUEUE_API_CALLED_AXIOS');
                     
-                    // Wait for the response to be processed and UI to update
-                    setTimeout(function() {
-                        window.printReceipt();
-                    }, 2500);  // Increased to 2.5 seconds for better reliability
+                    // Print once the response has been rendered
+                    promise.then(function() {
+                        printWhenUpdated(2500);
+                    });
                 }
                 
                 return promise;
@@ -198,7 +492,14 @@ class KioskBrowser(QMainWindow):
         
         console.log('Queue print bridge installed');
         """
-        self.web_view.page().loadFinished.connect(lambda ok: self.web_view.page().runJavaScript(js_bridge_code))
+        # Register the bridge once; the page injects it into every new document
+        bridge_script = QWebEngineScript()
+        bridge_script.setName("queue-print-bridge")
+        bridge_script.setSourceCode(js_bridge_code)
+        bridge_script.setInjectionPoint(QWebEngineScript.DocumentReady)
+        bridge_script.setWorldId(QWebEngineScript.MainWorld)
+        bridge_script.setRunsOnSubFrames(False)
+        self.web_view.page().scripts().insert(bridge_script)
         
         # Connect JavaScript print events to our silent print function
         self.web_view.page().printRequested.connect(self.print_page)
@@ -208,305 +509,244 @@ class KioskBrowser(QMainWindow):
         try:
             # Try the newer method first
             self.web_view.page().javaScriptConsoleMessageReceived.connect(self.handle_console_message)
-            print("Connected to javaScriptConsoleMessageReceived signal")
+            log.debug("Connected to javaScriptConsoleMessageReceived signal")
         except AttributeError:
             # Fall back to the older method
             try:
                 # Connect to the older signal if available
                 self.web_view.page().javaScriptConsoleMessage = self.handle_console_message_old
-                print("Using older javaScriptConsoleMessage method")
+                log.debug("Using older javaScriptConsoleMessage method")
             except Exception as e:
-                print(f"Could not set up console message handler: {e}")
-                print("JavaScript print detection via console may not work")
+                log.warning("Could not set up console message handler: %s", e)
+                log.warning("JavaScript print detection via console may not work")
     
     def print_page(self):
         """Print the current page silently to the POS printer"""
-        print("Print page method called - attempting to print...")
+        log.debug("Print page method called - attempting to print...")
         
-        def extract_queue_info(html_content):
-            """Extract queue information from the HTML content"""
-            # This function extracts queue data from the page, including number, date, and waiting count
-            import re
-            import json
-            
-            # Print debug info about the HTML content
-            print(f"HTML Content length: {len(html_content)}")
-            print(f"HTML Content preview: {html_content[:200]}...")
-            
-            # Result dictionary to return
-            result = {
-                'queue_number': "0",
-                'timestamp': "",
-                'waiting_count': 0  # Default to 0
-            }
-            
-            # Look for a large number in the center of the page (likely the queue number)
-            # First try to find the numbershow in Vue.js data
-            queue_match = re.search(r'numbershow[^:]*:[^"]*"(\d+)"', html_content)
-            if queue_match:
-                result['queue_number'] = queue_match.group(1)
-                print(f"Found queue number from numbershow: {result['queue_number']}")
-            else:
-                # Then try to find a number between 1-999 that's surrounded by whitespace
-                queue_match = re.search(r'\s(\d{1,3})\s', html_content)
-                if queue_match:
-                    result['queue_number'] = queue_match.group(1)
-                    print(f"Found queue number from whitespace pattern: {result['queue_number']}")
-                else:
-                    # If that fails, look for any number
-                    queue_match = re.search(r'\b(\d{1,3})\b', html_content)
-                    if queue_match:
-                        result['queue_number'] = queue_match.group(1)
-                        print(f"Found queue number from word boundary pattern: {result['queue_number']}")
-            
-            # Extract date/time - looking for date format like "16/05/ 05:12"
-            date_match = re.search(r'(\d{1,2}/\d{1,2}/\s*\d{1,2}:\d{1,2})', html_content)
-            if date_match:
-                result['timestamp'] = date_match.group(1)
-            
-            # Extract waiting count from the Vue.js app html content
-            # PRIORITY 1: Look for Thai format "รอXคิว" which is the rendered content
-            try:
-                # First check for the Thai wait text which is most accurate
-                waiting_match = re.search(r'รอ(\d+)คิว', html_content)
-                if waiting_match:
-                    result['waiting_count'] = int(waiting_match.group(1))
-                    print(f"Found waiting count from Thai text: {result['waiting_count']}")
-                    
-                # PRIORITY 2: Look for difference in JSON format
-                else:    
-                    difference_match = re.search(r'difference[^:]*:\s*(\d+)', html_content)
-                    if difference_match:
-                        result['waiting_count'] = int(difference_match.group(1))
-                        print(f"Found waiting count from difference field: {result['waiting_count']}")
-                        
-                    # PRIORITY 3: Fallback to calculated value based on queue number
-                    else:
-                        queue_num = int(result['queue_number'])
-                        # Standard logic: waiting count is queue_number - 1, with minimum of 0
-                        if queue_num <= 1:
-                            result['waiting_count'] = 0
-                        else:
-                            result['waiting_count'] = queue_num - 1
-                        print(f"Using calculated waiting count: {result['waiting_count']} (fallback only)")
-            except Exception as e:
-                print(f"Error extracting waiting count: {e}")
-                # Default to 0 if any error occurs
-                result['waiting_count'] = 0
-                
-                # Try a simpler regex as last resort
-                try:
-                    # Super simplified pattern - just look for a digit after "รอ"
-                    simple_match = re.search(r'รอ\s*(\d+)', html_content)
-                    if simple_match:
-                        result['waiting_count'] = int(simple_match.group(1))
-                        print(f"Found waiting count with simplified pattern: {result['waiting_count']}")
-                except:
-                    pass
-            
-            return result
+        # Pull just the queue fields out of the page inside the renderer
+        log.debug("Requesting queue info from page...")
+        self.web_view.page().runJavaScript(_QUEUE_INFO_JS, self._handle_extracted)
+    
+    def _handle_extracted(self, payload):
+        """Receive the queue fields extracted by _QUEUE_INFO_JS"""
+        if not payload:
+            # Extractor failed (e.g. script error); scan the page text instead
+            log.debug("Page extractor returned nothing, requesting page text...")
+            self.web_view.page().toPlainText(self._handle_html)
+            return
+        log.debug("Extracted queue info: %s", payload)
+        self._handle_queue_info(json.loads(payload))
+    
+    def _handle_html(self, html):
+        """Fallback path: extract the queue fields from the page text in Python"""
+        log.debug("Received HTML content: %s characters", len(html))
         
-        def handle_html(html):
-            print(f"Received HTML content: {len(html)} characters")
-            
-            # Save the raw HTML for debugging
+        # Save the raw HTML for debugging
+        if DEV_MODE:
             with open("/tmp/raw_print.html", "w", encoding="utf-8") as f:
                 f.write(html)
-            
-            # Extract queue information from the page content
-            queue_info = extract_queue_info(html)
-            queue_number = queue_info['queue_number']
-            date_time = queue_info['timestamp']
-            
-            # Get waiting count or use a default
-            waiting_count = queue_info.get('waiting_count', 15)  # Default to 15 if not found
-            
-            # Use the extracted queue number directly
-            customer_queue = queue_number
-            
-            # Create a complete receipt as an image
-            if DIRECT_THERMAL_PRINTING:
-                try:
-                    # Create a temporary image file for the complete receipt using Thai receipt generator
-                    # Use dynamic waiting count
-                    waiting_message = f"รอ {waiting_count} คิว"  # Format as "waiting X queues" in Thai
-                    
-                    receipt_image_path = self.thai_receipt_generator.create_receipt(
-                        service_name="ฝ่ายสินเชื่อ",  # Department name in Thai
-                        queue_number=str(customer_queue),  # The queue number in large text
-                        timestamp=date_time,
-                        waiting_count=waiting_message  # Dynamic waiting count
-                    )
-                    
-                    # Store the image path for printing
-                    self.receipt_image_path = receipt_image_path
-                    
-                    # Set minimal text content (not used when printing image)
-                    title = "Your Queue"
-                    content = f"Number: {customer_queue}\n"
-                except Exception as e:
-                    print(f"Error creating Thai text image: {e}")
-                    # Fallback to plain text if image creation fails
-                    title = "Your Queue"
-                    content = f"Number: {queue_number}\n\n"
-                    self.receipt_image_path = None
-            else:
-                # For non-direct printing, just use plain text
+        
+        # Extract queue information from the page content
+        self._handle_queue_info(_extract_queue_info(html))
+    
+    def _handle_queue_info(self, queue_info):
+        # Rendering and USB/CUPS I/O run on the print pool, off the UI thread
+        self._print_pool.start(PrintJob(self, queue_info))
+    
+    def print_queue_receipt(self, queue_info):
+        """Render and print a receipt for the extracted queue info; runs on a worker thread"""
+        queue_number = queue_info['queue_number']
+        date_time = queue_info['timestamp']
+        
+        # Get waiting count or use a default
+        waiting_count = queue_info.get('waiting_count', 15)  # Default to 15 if not found
+        
+        # Use the extracted queue number directly
+        customer_queue = queue_number
+        
+        # Create a complete receipt as an image
+        if DIRECT_THERMAL_PRINTING:
+            try:
+                # Create a temporary image file for the complete receipt using Thai receipt generator
+                # Use dynamic waiting count
+                waiting_message = f"รอ {waiting_count} คิว"  # Format as "waiting X queues" in Thai
+                
+                receipt_raster = self.get_receipt_image(
+                    service_name="ฝ่ายสินเชื่อ",  # Department name in Thai
+                    queue_number=str(customer_queue),  # The queue number in large text
+                    timestamp=date_time,
+                    waiting_count=waiting_message  # Dynamic waiting count
+                )
+                
+                # Set minimal text content (not used when printing image)
+                title = "Your Queue"
+                content = f"Number: {customer_queue}\n"
+            except Exception as e:
+                log.error("Error creating Thai text image: %s", e)
+                # Fallback to plain text if image creation fails
                 title = "Your Queue"
                 content = f"Number: {queue_number}\n\n"
-            
-            # Current date/time for the receipt
-            from datetime import datetime
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            footer = f"Printed: {current_time}\nThank you!"
-            
-            print(f"Printing receipt with title: {title}")
-            print(f"Content length: {len(content)} characters")
-            
-            # Try direct USB printing first
-            if DIRECT_THERMAL_PRINTING:
-                print("Attempting direct USB printing...")
-                try:
-                    # Import here to avoid circular imports
-                    from thermal_printer import get_printer
-                    
-                    # Print the actual content with Thai text as image
-                    printer = get_printer()
-                    if printer.connect():
-                        # Use the existing printer connection to print Thai text
-                        if hasattr(self, 'receipt_image_path') and self.receipt_image_path:
-                            try:
-                                # Use a custom receipt method that prints the complete receipt image
-                                success = self.print_receipt_image(
-                                    printer=printer,
-                                    image_path=self.receipt_image_path
-                                )
-                                
-                                # Clean up the temporary image file
-                                try:
-                                    os.unlink(self.receipt_image_path)
-                                except Exception as e:
-                                    print(f"Error removing temp file: {e}")
-                            except Exception as e:
-                                print(f"Error with Thai image printing: {e}")
-                                # Fall back to regular text printing
-                                success = printer.print_receipt(title, content, footer)
-                        else:
+                receipt_raster = None
+        else:
+            # For non-direct printing, just use plain text
+            receipt_raster = None
+            title = "Your Queue"
+            content = f"Number: {queue_number}\n\n"
+        
+        # Current date/time for the receipt
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        footer = f"Printed: {current_time}\nThank you!"
+        
+        log.debug("Printing receipt with title: %s", title)
+        log.debug("Content length: %s characters", len(content))
+        
+        # Try direct USB printing first
+        if DIRECT_THERMAL_PRINTING:
+            log.debug("Attempting direct USB printing...")
+            try:
+                # Print the actual content with Thai text as image
+                printer = get_printer()
+                if printer.ensure_connected():
+                    # Use the existing printer connection to print Thai text
+                    if receipt_raster:
+                        try:
+                            # Use a custom receipt method that prints the complete receipt image
+                            success = self.print_receipt_raster(
+                                printer=printer,
+                                raster=receipt_raster
+                            )
+                        except Exception as e:
+                            log.error("Error with Thai image printing: %s", e)
                             # Fall back to regular text printing
                             success = printer.print_receipt(title, content, footer)
-                        
-                        printer.disconnect()
-                        if success:
-                            print("Receipt printed successfully using direct USB")
-                            self.on_print_finished(True)
-                            return
-                        else:
-                            print("Failed to print receipt using direct USB")
                     else:
-                        print("Failed to connect to thermal printer")
-                except Exception as e:
-                    print(f"Error using thermal printer: {e}")
-                    import traceback
-                    traceback.print_exc()
+                        # Fall back to regular text printing
+                        success = printer.print_receipt(title, content, footer)
                     
-                # If direct printing fails, fall back to CUPS
-                print("Falling back to CUPS printing...")
-            
-            # Fall back to CUPS printing if direct printing is not available or fails
-            try:
-                # Save content as text file
-                temp_file = "/tmp/pos_print.txt"
-                with open(temp_file, "w", encoding="utf-8") as f:
-                    # Use the plain text version
-                    f.write(f"{title}\n\n{content}\n{footer}")
-                
-                # Send directly to POS printer using lp command
-                printer_name = "xprinter"  # Updated printer name
-                print(f"Sending to CUPS printer: {printer_name}")
-                result = os.system(f"lp -d {printer_name} {temp_file}")
-                print(f"CUPS command result: {result}")
-                
-                if result == 0:
-                    print(f"Silent print job sent to {printer_name} printer via CUPS")
-                    self.on_print_finished(True)
+                    if success:
+                        log.debug("Receipt printed successfully using direct USB")
+                        return True
+                    else:
+                        log.error("Failed to print receipt using direct USB")
                 else:
-                    print(f"Failed to send print job to {printer_name} printer via CUPS")
-                    self.on_print_finished(False)
+                    log.error("Failed to connect to thermal printer")
             except Exception as e:
-                print(f"Error with CUPS printing: {e}")
-                import traceback
-                traceback.print_exc()
-                self.on_print_finished(False)
-
-        # Get the plain text content of the page
-        print("Requesting page content...")
-        self.web_view.page().toPlainText(handle_html)
+                log.exception("Error using thermal printer: %s", e)
+                
+            # If direct printing fails, fall back to CUPS
+            log.debug("Falling back to CUPS printing...")
+        
+        # Fall back to CUPS printing if direct printing is not available or fails
+        try:
+            # Use the plain text version
+            payload = f"{title}\n\n{content}\n{footer}".encode("utf-8")
+            
+            # Send directly to POS printer by piping the text into lp
+            printer_name = "xprinter"  # Updated printer name
+            log.debug("Sending to CUPS printer: %s", printer_name)
+            result = subprocess.run(["lp", "-d", printer_name], input=payload,
+                                    capture_output=True)
+            log.debug("CUPS command result: %s", result.returncode)
+            
+            if result.returncode == 0:
+                log.debug("Silent print job sent to %s printer via CUPS", printer_name)
+                return True
+            log.error("Failed to send print job to %s printer via CUPS: %s", printer_name,
+                      result.stderr.decode("utf-8", errors="replace").strip())
+            return False
+        except Exception as e:
+            log.exception("Error with CUPS printing: %s", e)
+            return False
+
+    def get_receipt_image(self, service_name, queue_number, timestamp, waiting_count):
+        """Return the receipt as a printer raster, reusing the last render of identical content"""
+        # Without a page timestamp the generator stamps the current time, so
+        # the result can't be reused
+        key = (service_name, queue_number, timestamp, waiting_count) if timestamp else None
+        
+        raster = self._receipt_cache.get(key) if key else None
+        if raster:
+            self._receipt_cache.move_to_end(key)
+            log.debug("Reusing cached receipt raster (%s bytes)", len(raster[2]))
+            return raster
+            
+        # Rendered straight to printer bits; no PNG to encode, write or decode
+        raster = self.thai_receipt_generator.create_receipt(
+            service_name=service_name,
+            queue_number=queue_number,
+            timestamp=timestamp,
+            waiting_count=waiting_count,
+            output="raster"
+        )
+        if raster and key:
+            self._receipt_cache[key] = raster
+            if len(self._receipt_cache) > RECEIPT_CACHE_SIZE:
+                self._receipt_cache.popitem(last=False)
+        return raster
     
+    @pyqtSlot(bool)
     def on_print_finished(self, success):
         """Callback for print completion"""
-        print(f"Print {'succeeded' if success else 'failed'}")
+        log.info("Print %s", "succeeded" if success else "failed")
 
     def handle_console_message(self, message, line, source):
         """Handle console messages from JavaScript (newer PyQt5 versions)"""
-        print(f"Console message: {message} (from {source}:{line})")
+        log.debug("Console message: %s (from %s:%s)", message, source, line)
         if "PRINT_REQUESTED" in message:
-            print("Print request detected from console message")
+            log.debug("Print request detected from console message")
             self.print_page()
         elif "QUEUE_BUTTON_CLICKED" in message:
-            print("Queue button click detected")
+            log.debug("Queue button click detected")
         elif "QUEUE_API_CALLED" in message or "QUEUE_API_CALLED_AXIOS" in message:
-            print("Queue API call detected")
+            log.debug("Queue API call detected")
 
     def handle_console_message_old(self, level, message, line, source):
         """Handle console messages from JavaScript (older PyQt5 versions)"""
-        print(f"Console message (old): {message} (from {source}:{line})")
+        log.debug("Console message (old): %s (from %s:%s)", message, source, line)
         if "PRINT_REQUESTED" in message:
-            print("Print request detected from console message (old)")
+            log.debug("Print request detected from console message (old)")
             self.print_page()
             
-    def print_receipt_image(self, printer, image_path):
-        """Print a complete receipt image using the thermal printer"""
+    def print_receipt_raster(self, printer, raster):
+        """Print a (width_bytes, height, data) receipt raster using the thermal printer"""
         try:
-            print("Printing receipt as image...")
-            
-            # Save the image to a temporary file
-            fd, temp_path = tempfile.mkstemp(suffix='.png')
-            os.close(fd)
+            log.debug("Printing receipt as image...")
             
-            # Use the thermal_printer module to print the image
-            if hasattr(printer, 'print_image'):
-                # If the printer has a print_image method, use it
-                success = printer.print_image(image_path)
+            # Use the thermal_printer module to print the raster
+            if hasattr(printer, 'print_raster'):
+                # If the printer has a print_raster method, use it
+                success = printer.print_raster(*raster)
                 return success
             else:
                 # Try to use the escpos library directly
                 try:
-                    from escpos.printer import Usb
                     vendor_id = 0x0483
                     product_id = 0x070b
                     
-                    # Disconnect the current connection
+                    # Release the thermal printer's interface claim so escpos can use the device
                     printer.disconnect()
                     
-                    # Create a new connection
-                    p = Usb(vendor_id, product_id)
-                    p.image(image_path)
+                    # Open the escpos connection once and reuse it for later prints
+                    p = getattr(self, '_escpos_printer', None)
+                    if p is None:
+                        p = self._escpos_printer = open_buffered_usb(vendor_id, product_id)
+                    p._raw(raster_command(*raster))
                     p.cut()
-                    p.close()
+                    # Raster and cut go out in a single USB bulk transfer
+                    p.flush()
                     return True
                 except Exception as e:
-                    print(f"Error printing image with escpos: {e}")
+                    log.error("Error printing image with escpos: %s", e)
                     
                     # Fall back to using the print_receipt method
-                    print("Falling back to text receipt...")
+                    log.debug("Falling back to text receipt...")
                     receipt_title = "Your Queue"
                     receipt_content = "Please see display for queue information."
                     receipt_footer = "Thank you!"
                     return printer.print_receipt(receipt_title, receipt_content, receipt_footer)
         except Exception as e:
-            print(f"Error printing receipt image: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error printing receipt image: %s", e)
             return False
 
     def print_thai_receipt_with_image(self, printer, title, content, footer, image_path, queue_number, timestamp, waiting_count=None):
@@ -520,8 +760,8 @@ class KioskBrowser(QMainWindow):
                 # Print title in English
                 p.text(f"\n{title}\n\n")
                 
-                # Print the Thai text as image
-                p.image(image_path)
+                # Print the Thai text as a GS v 0 raster, skipping escpos's dithering
+                p._raw(image_to_raster(image_path))
                 
                 # Print footer
                 p.text(f"\n{footer}\n")
@@ -531,7 +771,7 @@ class KioskBrowser(QMainWindow):
                 # Try to access the raw printer commands via your thermal_printer module
                 # This depends on how your thermal_printer module is implemented
                 # You may need to add a method to your thermal_printer module to print images
-                print("Using manual ESC/POS commands to print image")
+                log.debug("Using manual ESC/POS commands to print image")
                 
                 # Use the existing thermal_printer module to print a complete receipt
                 # Combine the Thai title (which we'll handle separately) with the queue info
@@ -551,7 +791,6 @@ class KioskBrowser(QMainWindow):
                 if timestamp:
                     receipt_content += f"{timestamp}\n"
                 else:
-                    from datetime import datetime
                     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     receipt_content += f"{current_time}\n"
                 
@@ -562,189 +801,226 @@ class KioskBrowser(QMainWindow):
                 success = printer.print_receipt(receipt_title, receipt_content, receipt_footer)
                 return success
         except Exception as e:
-            print(f"Error in print_thai_receipt_with_image: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error in print_thai_receipt_with_image: %s", e)
             return False
 
+def image_to_raster(image_path, threshold=200):
+    """Threshold an image and pack it into an ESC/POS GS v 0 raster command"""
+    with Image.open(image_path) as img:
+        if img.mode == '1':
+            # Already 1-bit: white pixels are True, so invert instead of thresholding
+            bits = ~np.asarray(img)
+        else:
+            bits = np.asarray(img.convert('L')) <= threshold
+    
+    # Dark pixels become 1 (heat the dot); packbits pads rows to whole bytes
+    packed = np.packbits(bits, axis=1)
+    height, width_bytes = packed.shape
+    return raster_command(width_bytes, height, packed.tobytes())
+
+def raster_command(width_bytes, height, data):
+    """Wrap packed 1-bit rows (1 = black) in an ESC/POS GS v 0 command"""
+    return GS_V0 + struct.pack('<HH', width_bytes, height) + data
+
+def open_buffered_usb(vendor_id, product_id):
+    """Open an escpos Usb printer whose commands are collected until flush()"""
+    from escpos.printer import Usb
+    
+    class BufferedUsb(Usb):
+        def __init__(self, *args, **kwargs):
+            self._buffer = bytearray()
+            super().__init__(*args, **kwargs)
+        
+        def _raw(self, msg):
+            self._buffer += msg
+        
+        def flush(self):
+            """Send everything queued by _raw() as one bulk write"""
+            if self._buffer:
+                try:
+                    self.device.write(self.out_ep, bytes(self._buffer), self.timeout)
+                finally:
+                    # Never carry a failed job over into the next receipt
+                    self._buffer = bytearray()
+    
+    return BufferedUsb(vendor_id, product_id)
+
+# Fonts don't come and go during a kiosk session, so probe for them once at import
+_THAI_FONT_PATHS = (
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+    "/usr/share/fonts/truetype/thai/TlwgTypo.ttf",
+    "/home/mllseminipc/pythonbrowser/THSarabunNew.ttf",  # Check if you have this custom font
+    "/usr/share/fonts/truetype/tlwg/TlwgMono.ttf"
+)
+_THAI_FONT_PATH = next((path for path in _THAI_FONT_PATHS if os.path.exists(path)),
+                       "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+# DejaVu Sans Bold has good number rendering; fall back to the Thai font
+_NUMBER_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+if not os.path.exists(_NUMBER_FONT_PATH):
+    _NUMBER_FONT_PATH = _THAI_FONT_PATH
+
+@functools.lru_cache(maxsize=16)
+def _load_font(path, size):
+    """Load a TrueType font once per (path, size)"""
+    return ImageFont.truetype(path, size)
+
 def create_receipt_image(self, service_name, queue_number, date_time, waiting_count=None):
     """Create a complete receipt image with Thai text, service name, queue number and waiting count"""
     try:
-        # Find a suitable Thai font
-        font_paths = [
-            "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
-            "/usr/share/fonts/truetype/thai/TlwgTypo.ttf",
-            "/home/mllseminipc/pythonbrowser/THSarabunNew.ttf",  # Check if you have this custom font
-            "/usr/share/fonts/truetype/tlwg/TlwgMono.ttf"
-        ]
-        
-        font_path = None
-        for path in font_paths:
-            if os.path.exists(path):
-                font_path = path
-                print(f"Using Thai font: {path}")
-                break
-                
-        if not font_path:
-            print("No Thai font found, using default")
-            # Try to use a default system font as fallback
-            font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+        font_path = _THAI_FONT_PATH
             
         # Create an image with the right size for a 58mm receipt (about 384 pixels wide)
         width = 384
         
         # Create fonts in different sizes - match the receipt screenshot
-        title_font = ImageFont.truetype(font_path, 25)      # Service name font
+        title_font = _load_font(font_path, 25)      # Service name font
         
         # For queue numbers, use a standard sans-serif font that renders digits clearly
-        # Try DejaVu Sans first as it has good number rendering
-        number_font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-        if not os.path.exists(number_font_path):
-            number_font_path = font_path  # Fall back to Thai font if needed
-        
-        queue_font = ImageFont.truetype(number_font_path, 80)  # Large font for queue number
-        date_font = ImageFont.truetype(font_path, 18)       # Smaller font for date
-        wait_font = ImageFont.truetype(font_path, 18)       # Font for waiting count
+        number_font_path = _NUMBER_FONT_PATH
         
-        # Create a temporary image to measure text heights
-        temp_img = Image.new('RGB', (width, 500), color='white')
-        temp_draw = ImageDraw.Draw(temp_img)
-        
-        # Calculate heights for each element
-        title_bbox = temp_draw.textbbox((0, 0), service_name, font=title_font)
-        title_height = title_bbox[3] - title_bbox[1]
-        
-        queue_bbox = temp_draw.textbbox((0, 0), queue_number, font=queue_font)
-        queue_height = queue_bbox[3] - queue_bbox[1]
+        queue_font = _load_font(number_font_path, 80)  # Large font for queue number
+        date_font = _load_font(font_path, 18)       # Smaller font for date
+        wait_font = _load_font(font_path, 18)       # Font for waiting count
         
+        # Handle empty or whitespace-only queue numbers
+        if not queue_number or queue_number.strip() == "":
+            queue_number = "0"  # Default to zero if empty
+            
         # Use provided date_time or current time
         if not date_time:
-            from datetime import datetime
             date_time = datetime.now().strftime("%d/%m/ %H:%M รอ")
             
-        date_bbox = temp_draw.textbbox((0, 0), date_time, font=date_font)
+        # Format the waiting count as "รอ X คิว" before it is measured (None counts as 0);
+        # text without a count is drawn as given
+        waiting_count = format_waiting_count(0 if waiting_count is None else waiting_count)
+            
+        # Measure each element straight from the font metrics, no scratch image needed
+        title_bbox = title_font.getbbox(service_name)
+        title_height = title_bbox[3] - title_bbox[1]
+        
+        queue_bbox = queue_font.getbbox(queue_number)
+        queue_height = queue_bbox[3] - queue_bbox[1]
+        
+        date_bbox = date_font.getbbox(date_time)
         date_height = date_bbox[3] - date_bbox[1]
         
-        wait_bbox = temp_draw.textbbox((0, 0), waiting_count, font=wait_font)
+        wait_bbox = wait_font.getbbox(waiting_count)
         wait_height = wait_bbox[3] - wait_bbox[1]
         
         # Calculate total height with spacing
         total_height = title_height + queue_height + date_height + wait_height + 80  # Add padding
         
-        # Create the actual image
-        image = Image.new('RGB', (width, total_height), color='white')
+        # Create the actual image in 1-bit mode; the thermal printer has no grays
+        image = Image.new('1', (width, total_height), color=1)
         draw = ImageDraw.Draw(image)
         
         # Current Y position for drawing
         y_position = 20
         
         # Draw the service name centered
-        title_bbox = draw.textbbox((0, 0), service_name, font=title_font)
-        title_width = title_bbox[2] - title_bbox[0]
-        draw.text(((width - title_width) // 2, y_position), service_name, font=title_font, fill='black')
+        draw.text((width // 2, y_position), service_name, font=title_font, fill=0, anchor="ma")
         y_position += title_height + 20
         
-        # Handle empty or whitespace-only queue numbers
-        if not queue_number or queue_number.strip() == "":
-            queue_number = "0"  # Default to zero if empty
-            
-        # Draw the queue number large and centered
+        # Draw the queue number large and centered, from custom digit images
+        # when possible; only the render call itself is guarded
+        num_image = None
         if CUSTOM_DIGIT_RENDERING and queue_number.isdigit():
-            # Use our custom digit rendering for numbers
             try:
-                # Generate a custom digit image
-                digit_size = 70  # Adjust as needed
-                num_image = create_number_image(queue_number, digit_size=digit_size)
-                
-                # Calculate position to center it
-                if num_image:
-                    num_width, num_height = num_image.size
-                    x_pos = (width - num_width) // 2
-                    
-                    # Paste the number image onto our receipt
-                    # Convert binary image (mode '1') to compatible format
-                    # Need to convert from '1' mode which is binary (0,1) to 'RGB' which uses (0-255)
-                    num_image_rgb = num_image.convert('RGB')
-                    image.paste(num_image_rgb, (x_pos, y_position))
-                    queue_height = num_height
-                else:
-                    # Fall back to text rendering if digit image creation failed
-                    queue_bbox = draw.textbbox((0, 0), queue_number, font=queue_font)
-                    queue_width = queue_bbox[2] - queue_bbox[0]
-                    draw.text(((width - queue_width) // 2, y_position), queue_number, font=queue_font, fill='black')
+                num_image = create_number_mask(queue_number, digit_size=70)
             except Exception as e:
-                print(f"Error creating digit image: {e}")
-                # Fall back to text rendering
-                queue_bbox = draw.textbbox((0, 0), queue_number, font=queue_font)
-                queue_width = queue_bbox[2] - queue_bbox[0]
-                draw.text(((width - queue_width) // 2, y_position), queue_number, font=queue_font, fill='black')
+                log.error("Error creating digit image: %s", e)
+        
+        if num_image:
+            num_width, num_height = num_image.size
+            x_pos = (width - num_width) // 2
+            
+            # Blit black through the 1-bit digit mask; no mode conversion needed
+            image.paste(0, (x_pos, y_position), mask=num_image)
+            queue_height = num_height
         else:
-            # Fall back to text rendering for non-numeric content
-            queue_bbox = draw.textbbox((0, 0), queue_number, font=queue_font)
-            queue_width = queue_bbox[2] - queue_bbox[0]
-            draw.text(((width - queue_width) // 2, y_position), queue_number, font=queue_font, fill='black')
+            # Text rendering for non-numeric content or a failed digit image
+            draw.text((width // 2, y_position), queue_number, font=queue_font, fill=0, anchor="ma")
         
         y_position += queue_height + 15
         
         # Draw the timestamp centered
-        date_bbox = draw.textbbox((0, 0), date_time, font=date_font)
-        date_width = date_bbox[2] - date_bbox[0]
-        draw.text(((width - date_width) // 2, y_position), date_time, font=date_font, fill='black')
+        draw.text((width // 2, y_position), date_time, font=date_font, fill=0, anchor="ma")
         y_position += date_height + 15
         
         # Draw waiting count centered
-        if waiting_count is None:
-            waiting_count = "รอ0คิว"  # Default to 0 if not provided
-        elif isinstance(waiting_count, (int, str)) and not waiting_count.startswith("รอ"):
-            # If it's just a number, format it as "รอXคิว"
-            waiting_count = f"รอ{waiting_count}คิว"
-            
-        wait_bbox = draw.textbbox((0, 0), waiting_count, font=wait_font)
-        wait_width = wait_bbox[2] - wait_bbox[0]
-        draw.text(((width - wait_width) // 2, y_position), waiting_count, font=wait_font, fill='black')
+        draw.text((width // 2, y_position), waiting_count, font=wait_font, fill=0, anchor="ma")
         
-        # Save to a temporary file
+        # Save to a temporary file; it is read back once, so compress lightly
         fd, path = tempfile.mkstemp(suffix='.png')
         os.close(fd)
-        image.save(path)
-        print(f"Thai text image created at {path}")
+        image.save(path, 'PNG', optimize=False, compress_level=1)
+        log.debug("Thai text image created at %s", path)
         return path
             
     except Exception as e:
-        print(f"Error creating Thai text image: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error creating Thai text image: %s", e)
         return None
 
+def setup_logging():
+    """Send log records through a queue so console writes happen off the UI thread"""
+    log_queue = queue.Queue(-1)
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    listener.start()
+    return listener
+
 def main():
     # Get URL from command line if provided
     url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_URL
     
+    log_listener = setup_logging()
+    
+    # Which optional modules imported, decided at import time before logging existed
+    if CUSTOM_DIGIT_RENDERING:
+        log.info("Custom digit rendering available")
+    else:
+        log.info("Custom digit rendering not available, using fonts instead")
+    if DIRECT_THERMAL_PRINTING:
+        log.info("Thermal printer module loaded successfully")
+    else:
+        log.warning("Thermal printer module or PIL not found: %s, falling back to CUPS printing",
+                    _PRINTER_IMPORT_ERROR)
+    
+    # Chromium reads its flags when the web engine starts, so set them before
+    # the application exists; an explicit environment setting wins
+    if CHROMIUM_FLAGS:
+        os.environ.setdefault("QTWEBENGINE_CHROMIUM_FLAGS", CHROMIUM_FLAGS)
+    
     # Create Qt application
     app = QApplication(sys.argv)
     
-    # Set up request interceptor for autoplay
-    interceptor = WebEngineUrlInterceptor()
-    app.web_engine_url_request_interceptor = interceptor
+    # Pillow-SIMD builds carry a ".postN" suffix on the Pillow version
+    if DIRECT_THERMAL_PRINTING:
+        log.info("Using Pillow %s (%s)", PIL.__version__,
+                 "SIMD build" if ".post" in PIL.__version__ else "standard build")
     
     # Platform-specific adjustments
     if IS_LINUX:
-        print("Running on Linux")
+        log.info("Running on Linux")
         # Linux-specific settings can be added here
     elif IS_WINDOWS:
-        print("Running on Windows")
+        log.info("Running on Windows")
         # Windows-specific settings can be added here
     
     # Create and show browser
     browser = KioskBrowser(url)
     browser.show()
     
-    print(f"Kiosk browser started - loading {url}")
-    print(f"Press Ctrl+Alt+Q to exit" if EXIT_SHORTCUT_ENABLED else "")
-    print("Press 'P' to print a receipt")
+    log.info("Kiosk browser started - loading %s", url)
+    if EXIT_SHORTCUT_ENABLED:
+        log.info("Press Ctrl+Alt+Q to exit")
+    log.info("Press 'P' to print a receipt")
     
     # Start application
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    log_listener.stop()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
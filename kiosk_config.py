@@ -16,6 +16,13 @@ KIOSK_MODE = True
 BROWSER_WIDTH = 1280
 BROWSER_HEIGHT = 800
 
+# Extra Chromium flags for the embedded web engine (empty string for none)
+CHROMIUM_FLAGS = "--enable-gpu-rasterization --ignore-gpu-blocklist --disable-features=CalculateNativeWinOcclusion"
+
+# Hosts the browser may load from, e.g. ("teachersco.vercel.app",)
+# Leave empty to allow every host
+ALLOWED_HOSTS = ()
+
 # Development settings
 DEV_MODE = True  # Set to False in production
 EXIT_SHORTCUT_ENABLED = True  # Set to False in production
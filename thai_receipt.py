@@ -5,6 +5,11 @@ Creates properly formatted Thai receipts for thermal printers
 """
 
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import functools
+import io
+import logging
+import re
 import tempfile
 import os
 import time
@@ -12,57 +17,201 @@ from datetime import datetime
 # Import both options for number rendering
 from digit_images import create_number_image, DigitRenderer
 
+# Patterns used by extract_queue_info, compiled once at import
+_QUEUE_RE = re.compile(r'(?:<h1>|<div[^>]+>)\s*(\d{1,3})\s*(?:</h1>|</div>)')
+_QUEUE_FALLBACK_RE = re.compile(r'[^\d](\d{1,3})[^\d]')
+_DEPT_RE = re.compile(r'(?:<h[1-3]>|<div[^>]+>)\s*(ฝ่าย\w+)\s*(?:</h[1-3]>|</div>)')
+_DATE_RE = re.compile(r'(\d{1,2}/\d{1,2}/\s*\d{1,2}:\d{1,2})')
+_WAIT_RE = re.compile(r'รอ\s*(\d+)\s*คิว')
+
+# Waiting count in any of the forms the kiosk produces: "รอ 20 คิว", "รอ20คิว", "20คิว", "20"
+_WAIT_PARSE_RE = re.compile(r'^\s*(?:รอ\s*)?(\d+)\s*(?:คิว)?\s*$')
+
+# Fixed Thai text around the waiting count's number
+_WAIT_PREFIX = "รอ "
+_WAIT_SUFFIX = " คิว"
+
+def split_waiting_count(text):
+    """Split a waiting count into ("รอ ", number, " คิว"), or None if it holds no count"""
+    match = _WAIT_PARSE_RE.match(str(text))
+    if match is None:
+        return None
+    return _WAIT_PREFIX, match.group(1), _WAIT_SUFFIX
+
+def format_waiting_count(text):
+    """Waiting count as "รอ N คิว"; text without a count is returned unchanged"""
+    parts = split_waiting_count(text)
+    return "".join(parts) if parts else str(text)
+
+# Height of the reusable receipt buffer; a typical receipt is about 250px
+SCRATCH_HEIGHT = 600
+
+# The thermal printer's threshold: gray levels above it stay white
+PRINT_THRESHOLD = 200
+_PRINT_THRESHOLD_LUT = [255 if level > PRINT_THRESHOLD else 0 for level in range(256)]
+
+# Child of the kiosk logger, so records share its handlers when run from the kiosk
+log = logging.getLogger("kiosk.receipt")
+
+# Custom Thai font kept next to the kiosk, outside the system font directory
+_CUSTOM_THAI_FONT = "/home/mllseminipc/pythonbrowser/THSarabunNew.ttf"
+
+@functools.lru_cache(maxsize=None)
+def _font_dir_files(directory):
+    """Names of the files in one font directory, listed once per process"""
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except OSError:
+        return frozenset()
+
+def _font_installed(path):
+    """Check a candidate font path against its directory's cached listing"""
+    directory, name = os.path.split(path)
+    return name in _font_dir_files(directory)
+
+@functools.lru_cache(maxsize=1)
+def _resolve_thai_font():
+    """Find an available Thai font from common locations (probed once per process)"""
+    font_paths = [
+        "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+        "/usr/share/fonts/truetype/thai/TlwgTypo.ttf",
+        _CUSTOM_THAI_FONT,
+        "/usr/share/fonts/truetype/tlwg/TlwgMono.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Fallback
+    ]
+    
+    for path in font_paths:
+        if _font_installed(path):
+            log.info("Using Thai font: %s", path)
+            return path
+            
+    # Last resort fallback
+    log.warning("No suitable font found, using default")
+    return None
+    
+@functools.lru_cache(maxsize=1)
+def _resolve_number_font():
+    """Find a simple font for numbers that resembles Firefox print preview (probed once per process)"""
+    # Look for monospace or simple sans-serif fonts that render clearly on thermal printers
+    number_font_paths = [
+        "/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+        "/usr/share/fonts/truetype/freefont/FreeMono.ttf",
+        "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Good fallback
+        "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf"
+    ]
+    
+    for path in number_font_paths:
+        if _font_installed(path):
+            log.info("Using number font: %s", path)
+            return path
+    
+    # If no special number font is found, use the same as Thai font
+    return _resolve_thai_font()
+
 class ThaiReceiptGenerator:
     def __init__(self):
-        # Find a suitable Thai font
-        self.font_path = self._find_thai_font()
         self.digit_renderer = DigitRenderer(digit_size=70)
         self.receipt_width = 384  # Standard for 58mm thermal printers
         
+        # Fonts are found and loaded by _ensure_fonts() on the first receipt,
+        # so a kiosk that never prints doesn't pay for them at startup
+        self.font_path = None
+        self.number_font_path = None
+        self.title_font = self.queue_font = self.date_font = self.wait_font = None
+        self.digit_atlas = None
+        self.wait_prefix_width = self.wait_suffix_width = None
+        
+        # Prerendered text masks for fixed receipt text (service names, "รอ"/"คิว")
+        self._text_tiles = {}
+        
+        # Reusable drawing buffer for receipts up to SCRATCH_HEIGHT pixels tall
+        self._scratch = Image.new('L', (self.receipt_width, SCRATCH_HEIGHT), 255)
+        self._scratch_draw = ImageDraw.Draw(self._scratch)
+        
+    def _ensure_fonts(self):
+        """Find and load the receipt fonts once; sizes and paths never change"""
+        if self.title_font is not None:
+            return
+        # Find a suitable Thai font
+        self.font_path = self._find_thai_font()
         # Find a simple font for numbers (monospace/sans-serif)
         self.number_font_path = self._find_number_font()
         
+        self.queue_font = ImageFont.truetype(self.number_font_path, 92)  # Large, simple font for queue numbers
+        self.date_font = ImageFont.truetype(self.number_font_path, 24)   # Date/time with simple font
+        self.wait_font = ImageFont.truetype(self.font_path, 24)   # Waiting count with Thai font
+        
+        # Prerendered queue-number digits, pasted instead of rasterized per receipt
+        self.digit_atlas = self._build_digit_atlas(self.queue_font)
+        
+        # The Thai text around the waiting count is constant, so measure it once
+        prefix_bbox = self._text_tile(_WAIT_PREFIX, self.wait_font)[2]
+        self.wait_prefix_width = prefix_bbox[2] - prefix_bbox[0]
+        suffix_bbox = self._text_tile(_WAIT_SUFFIX, self.wait_font)[2]
+        self.wait_suffix_width = suffix_bbox[2] - suffix_bbox[0]
+        
+        # Set last: it marks the fonts as loaded
+        self.title_font = ImageFont.truetype(self.font_path, 33)  # Service name (Thai font)
+        
     def _find_thai_font(self):
         """Find an available Thai font from common locations"""
-        font_paths = [
-            "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
-            "/usr/share/fonts/truetype/thai/TlwgTypo.ttf",
-            "/home/mllseminipc/pythonbrowser/THSarabunNew.ttf",
-            "/usr/share/fonts/truetype/tlwg/TlwgMono.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Fallback
-        ]
-        
-        for path in font_paths:
-            if os.path.exists(path):
-                print(f"Using Thai font: {path}")
-                return path
-                
-        # Last resort fallback
-        print("Warning: No suitable font found, using default")
-        return None
+        return _resolve_thai_font()
         
     def _find_number_font(self):
         """Find a simple font for numbers that resembles Firefox print preview"""
-        # Look for monospace or simple sans-serif fonts that render clearly on thermal printers
-        number_font_paths = [
-            "/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-            "/usr/share/fonts/truetype/freefont/FreeMono.ttf",
-            "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Good fallback
-            "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf"
-        ]
-        
-        for path in number_font_paths:
-            if os.path.exists(path):
-                print(f"Using number font: {path}")
-                return path
-        
-        # If no special number font is found, use the same as Thai font
-        return self.font_path
+        return _resolve_number_font()
+    
+    def _build_digit_atlas(self, font):
+        """Render digits 0-9 once as uint8 coverage arrays of one common height, with their advance widths"""
+        height = max(font.getbbox(digit)[3] for digit in "0123456789")
+        atlas = {}
+        for digit in "0123456789":
+            right = font.getbbox(digit)[2]
+            advance = round(font.getlength(digit))
+            tile = Image.new('L', (max(right, advance), height), 0)
+            ImageDraw.Draw(tile).text((0, 0), digit, font=font, fill=255)
+            atlas[digit] = (np.asarray(tile), advance)
+        return atlas
+    
+    def _paste_digits(self, image, xy, digits):
+        """Draw a digit string from the atlas, same as draw.text at xy"""
+        # Lay the glyphs side by side in one array (each cut to its advance,
+        # the last kept whole) and paste that as a single mask
+        glyphs = [self.digit_atlas[digit] for digit in digits]
+        row = np.concatenate([tile[:, :advance] for tile, advance in glyphs[:-1]] + [glyphs[-1][0]], axis=1)
+        image.paste(0, xy, mask=Image.fromarray(row, 'L'))
+    
+    def _text_tile(self, text, font):
+        """Return (mask, bbox) for text rendered once in font, same as draw.text at (0, 0)"""
+        key = (text, font)
+        cached = self._text_tiles.get(key)
+        if cached is None:
+            bbox = font.getbbox(text)
+            # Shift right by any negative left bearing so nothing is clipped
+            shift = min(bbox[0], 0)
+            tile = Image.new('L', (max(bbox[2] - shift, 1), max(bbox[3], 1)), 0)
+            ImageDraw.Draw(tile).text((-shift, 0), text, font=font, fill=255)
+            cached = self._text_tiles[key] = (tile, shift, bbox)
+        return cached
     
-    def create_receipt(self, service_name, queue_number, timestamp=None, waiting_count="รอ 20 คิว"):
+    def _paste_text(self, image, xy, tile):
+        """Paste a (mask, shift, bbox) tile in black with its origin at xy"""
+        mask, shift, _ = tile
+        image.paste(0, (xy[0] + shift, xy[1]), mask=mask)
+    
+    def tobytes_for_thermal(self, img):
+        """Pack a grayscale receipt as (width_bytes, height, data) for an ESC/POS GS v 0 raster"""
+        # 1 bits are printed dots, so gray levels at or below the cutoff become 1;
+        # packbits pads each row to whole bytes
+        packed = np.packbits(np.asarray(img) <= PRINT_THRESHOLD, axis=1)
+        height, width_bytes = packed.shape
+        return width_bytes, height, packed.tobytes()
+    
+    def create_receipt(self, service_name, queue_number, timestamp=None, waiting_count="รอ 20 คิว", output="path"):
         """
         Create a complete receipt image with Thai text
         
@@ -71,20 +220,20 @@ class ThaiReceiptGenerator:
             queue_number: Queue number as string (e.g., "21")
             timestamp: Optional timestamp (defaults to current date/time)
             waiting_count: Waiting message (e.g., "20คิว")
+            output: "path" writes a temp PNG, "png" returns the PNG bytes,
+                "raster" returns tobytes_for_thermal() output with no PNG at all
+                and "image" returns the grayscale receipt image itself
             
         Returns:
-            Path to the generated image file
+            Path to the generated image file, PNG bytes, a raster tuple or an image, per output
         """
         try:
-            # Create fonts in different sizes (increased by 30% total)
-            title_font = ImageFont.truetype(self.font_path, 33)  # Service name (Thai font)
-            
-            # Use simpler font for queue numbers and date/time
-            queue_font = ImageFont.truetype(self.number_font_path, 92)  # Large, simple font for queue numbers
-            date_font = ImageFont.truetype(self.number_font_path, 24)   # Date/time with simple font
-            
-            # Use Thai font for waiting count (same as department name)
-            wait_font = ImageFont.truetype(self.font_path, 24)   # Waiting count with Thai font
+            # Fonts are loaded once, on first use (sizes increased by 30% total)
+            self._ensure_fonts()
+            title_font = self.title_font
+            queue_font = self.queue_font
+            date_font = self.date_font
+            wait_font = self.wait_font
             
             # Handle empty queue number
             if not queue_number or queue_number.strip() == "":
@@ -94,25 +243,28 @@ class ThaiReceiptGenerator:
             if not timestamp:
                 timestamp = datetime.now().strftime("%d/%m/ %H:%M รอ")
                 
-            # Calculate sizes for layout
-            temp_img = Image.new('RGB', (self.receipt_width, 500), color='white')
-            draw = ImageDraw.Draw(temp_img)
+            # Pre-calculate text sizes from the font metrics (no scratch image)
+            # The service name rarely changes, so its shaped text is cached
+            title_tile = self._text_tile(service_name, title_font)
+            title_left, title_top, title_right, title_bottom = title_tile[2]
+            title_width = title_right - title_left
+            title_height = title_bottom - title_top
             
-            # Pre-calculate text sizes
-            title_bbox = draw.textbbox((0, 0), service_name, font=title_font)
-            title_height = title_bbox[3] - title_bbox[1]
+            # Heights come from the ink box; the digit atlas path needs the advance
+            # width to place the glyphs, other text is centred with anchor="ma"
+            _, queue_top, _, queue_bottom = queue_font.getbbox(queue_number)
+            queue_height = queue_bottom - queue_top
+            queue_width = int(queue_font.getlength(queue_number))
             
-            # Calculate queue number size with our simpler font
-            queue_bbox = draw.textbbox((0, 0), queue_number, font=queue_font)
-            queue_width = queue_bbox[2] - queue_bbox[0]
-            queue_height = queue_bbox[3] - queue_bbox[1]
+            _, date_top, _, date_bottom = date_font.getbbox(timestamp)
+            date_height = date_bottom - date_top
             
-            # Text sizes for remaining elements
-            date_bbox = draw.textbbox((0, 0), timestamp, font=date_font)
-            date_height = date_bbox[3] - date_bbox[1]
-            
-            wait_bbox = draw.textbbox((0, 0), waiting_count, font=wait_font)
-            wait_height = wait_bbox[3] - wait_bbox[1]
+            # Waiting count is drawn as Thai prefix, number, Thai suffix; text
+            # without a count is drawn as given
+            wait_parts = split_waiting_count(waiting_count)
+            wait_text = "".join(wait_parts) if wait_parts else str(waiting_count)
+            _, wait_top, _, wait_bottom = wait_font.getbbox(wait_text)
+            wait_height = wait_bottom - wait_top
             
             # Calculate total receipt height
             total_height = (
@@ -123,54 +275,50 @@ class ThaiReceiptGenerator:
                 wait_height + 30     # Waiting count + bottom margin
             )
             
-            # Create the actual receipt image
-            receipt = Image.new('RGB', (self.receipt_width, total_height), color='white')
-            draw = ImageDraw.Draw(receipt)
+            # Draw in grayscale; the printer has no colour. Normal receipts reuse
+            # the scratch buffer (cleared in full, since text can overhang the
+            # previous layout), taller ones get a fresh image
+            if total_height <= SCRATCH_HEIGHT:
+                receipt = self._scratch
+                draw = self._scratch_draw
+                draw.rectangle((0, 0, self.receipt_width, SCRATCH_HEIGHT), fill=255)
+            else:
+                receipt = Image.new('L', (self.receipt_width, total_height), color=255)
+                draw = ImageDraw.Draw(receipt)
             
             # Start drawing from the top
             y_pos = 15
             
             # 1. Draw service name
-            title_width = title_bbox[2] - title_bbox[0]
             x_pos = (self.receipt_width - title_width) // 2  # Center horizontally
-            draw.text((x_pos, y_pos), service_name, font=title_font, fill='black')
+            self._paste_text(receipt, (x_pos, y_pos), title_tile)
             y_pos += title_height + 20
             
             # 2. Draw queue number using our simple font
-            x_pos = (self.receipt_width - queue_width) // 2
-            draw.text((x_pos, y_pos), queue_number, font=queue_font, fill='black')
+            if queue_number.isascii() and queue_number.isdigit():
+                # Copy prerendered glyphs instead of rasterizing the 92pt digits
+                x_pos = (self.receipt_width - queue_width) // 2
+                self._paste_digits(receipt, (x_pos, y_pos), queue_number)
+            else:
+                draw.text((self.receipt_width // 2, y_pos), queue_number, font=queue_font, fill=0, anchor="ma")
             y_pos += queue_height + 20
             
             # 3. Draw timestamp
-            date_width = date_bbox[2] - date_bbox[0]
-            x_pos = (self.receipt_width - date_width) // 2
-            draw.text((x_pos, y_pos), timestamp, font=date_font, fill='black')
+            draw.text((self.receipt_width // 2, y_pos), timestamp, font=date_font, fill=0, anchor="ma")
             y_pos += date_height + 25  # Add more space (25px instead of 15px) before the last line
             
             # 4. Draw waiting count with mixed fonts (Thai text in Thai font, numbers in simple font)
-            # First, we need to split the waiting count into parts
-            if waiting_count.startswith("รอ") and "คิว" in waiting_count:
-                # Split the "รอ 20 คิว" into ["รอ", "20", "คิว"]
-                parts = waiting_count.split()
-                if len(parts) >= 2 and parts[1].isdigit():
-                    # Handle "รอ" "20" "คิว" format with 3 parts
-                    thai_prefix = parts[0] + " "  # "รอ "
-                    number_part = parts[1]       # "20"
-                    thai_suffix = " " + parts[2]  # " คิว"
-                else:
-                    # Fall back to regular text if format doesn't match
-                    draw.text((self.receipt_width//2, y_pos), waiting_count, 
-                              font=wait_font, anchor="mt", fill='black')
-                    
-                # Calculate widths for positioning
-                prefix_bbox = draw.textbbox((0, 0), thai_prefix, font=wait_font)
-                prefix_width = prefix_bbox[2] - prefix_bbox[0]
+            if wait_parts:
+                thai_prefix, number_part, thai_suffix = wait_parts
+                # Only the number needs measuring; the Thai particles were measured with the fonts
+                prefix_tile = self._text_tile(thai_prefix, wait_font)
+                prefix_width = self.wait_prefix_width
                 
-                number_bbox = draw.textbbox((0, 0), number_part, font=date_font)  # Use simple font for number
+                number_bbox = date_font.getbbox(number_part)  # Use simple font for number
                 number_width = number_bbox[2] - number_bbox[0]
                 
-                suffix_bbox = draw.textbbox((0, 0), thai_suffix, font=wait_font)
-                suffix_width = suffix_bbox[2] - suffix_bbox[0]
+                suffix_tile = self._text_tile(thai_suffix, wait_font)
+                suffix_width = self.wait_suffix_width
                 
                 total_width = prefix_width + number_width + suffix_width
                 
@@ -178,56 +326,106 @@ class ThaiReceiptGenerator:
                 start_x = (self.receipt_width - total_width) // 2
                 
                 # Draw each part with the appropriate font
-                draw.text((start_x, y_pos), thai_prefix, font=wait_font, fill='black')
-                draw.text((start_x + prefix_width, y_pos), number_part, font=date_font, fill='black')  # Number with simple font
-                draw.text((start_x + prefix_width + number_width, y_pos), thai_suffix, font=wait_font, fill='black')
+                self._paste_text(receipt, (start_x, y_pos), prefix_tile)
+                draw.text((start_x + prefix_width, y_pos), number_part, font=date_font, fill=0)  # Number with simple font
+                self._paste_text(receipt, (start_x + prefix_width + number_width, y_pos), suffix_tile)
             else:
-                # If waiting count format doesn't match the expected format, draw it normally
-                wait_bbox = draw.textbbox((0, 0), waiting_count, font=wait_font)
-                wait_width = wait_bbox[2] - wait_bbox[0]
-                x_pos = (self.receipt_width - wait_width) // 2
-                draw.text((x_pos, y_pos), waiting_count, font=wait_font, fill='black')
-            
-            # Save to a temporary file
-            fd, path = tempfile.mkstemp(suffix='.png')
-            os.close(fd)
-            receipt.save(path)
-            print(f"Created Thai receipt at: {path}")
+                # No count to split out; draw the text as given
+                draw.text((self.receipt_width // 2, y_pos), wait_text, font=wait_font, fill=0, anchor="ma")
             
-            return path
+            if receipt is self._scratch:
+                receipt = receipt.crop((0, 0, self.receipt_width, total_height))
+            
+            return self._output_receipt(receipt, output)
             
         except Exception as e:
-            print(f"Error creating Thai receipt: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error creating Thai receipt: %s", e)
             return None
             
+    def create_receipts_batch(self, tickets, output="path"):
+        """
+        Create several receipts as one tall image, encoded or saved once
+        
+        Args:
+            tickets: List of dicts with create_receipt's arguments (service_name,
+                queue_number and optionally timestamp and waiting_count), such
+                as extract_queue_info() returns
+            output: "path", "png", "raster" or "image", as for create_receipt
+            
+        Returns:
+            (strip, band_heights): the receipts stacked top to bottom in ticket
+            order, in the form create_receipt returns for one, and the height in
+            pixels of each ticket's band, so the caller can cut or split the
+            strip between tickets; None if any of them fails
+        """
+        bands = []
+        for ticket in tickets:
+            band = self.create_receipt(ticket["service_name"], ticket["queue_number"],
+                                       ticket.get("timestamp"), ticket.get("waiting_count", "รอ 20 คิว"),
+                                       output="image")
+            if band is None:
+                return None
+            bands.append(band)
+            
+        # One strip, so the whole burst is encoded and sent in one go
+        strip = Image.new('L', (self.receipt_width, sum(band.height for band in bands)), color=255)
+        y_pos = 0
+        for band in bands:
+            strip.paste(band, (0, y_pos))
+            y_pos += band.height
+            
+        try:
+            return self._output_receipt(strip, output), [band.height for band in bands]
+        except Exception as e:
+            log.exception("Error creating Thai receipts: %s", e)
+            return None
+    
+    def _output_receipt(self, receipt, output):
+        """Return a grayscale receipt as a temp PNG path, PNG bytes, a raster or the image, per output"""
+        if output == "image":
+            return receipt
+        
+        if output == "raster":
+            # Printer-ready bits; skips PNG encode here and decode in the printer
+            return self.tobytes_for_thermal(receipt)
+        
+        # Threshold to 1-bit for a much smaller PNG, using the printer's cutoff
+        receipt = receipt.point(_PRINT_THRESHOLD_LUT, '1')
+        
+        if output == "png":
+            # Keep the PNG in memory with light compression; it is read straight back
+            buf = io.BytesIO()
+            receipt.save(buf, 'PNG', optimize=False, compress_level=1)
+            return buf.getvalue()
+        
+        # Save to a temporary file; the printer reads it once, so compress lightly
+        fd, path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        receipt.save(path, 'PNG', optimize=False, compress_level=1)
+        log.debug("Created Thai receipt at: %s", path)
+        
+        return path
+    
     def extract_queue_info(self, html_content):
         """Extract queue details from page content"""
-        import re
-        
         # Extract queue number - look for larger digits
-        queue_pattern = r'(?:<h1>|<div[^>]+>)\s*(\d{1,3})\s*(?:</h1>|</div>)'
-        queue_match = re.search(queue_pattern, html_content)
+        queue_match = _QUEUE_RE.search(html_content)
         if not queue_match:
             # Fall back to any digits
-            queue_match = re.search(r'[^\d](\d{1,3})[^\d]', html_content)
+            queue_match = _QUEUE_FALLBACK_RE.search(html_content)
             
         queue_number = queue_match.group(1) if queue_match else "0"
         
         # Extract service name - common Thai department names
-        dept_pattern = r'(?:<h[1-3]>|<div[^>]+>)\s*(ฝ่าย\w+)\s*(?:</h[1-3]>|</div>)'
-        dept_match = re.search(dept_pattern, html_content)
+        dept_match = _DEPT_RE.search(html_content)
         service_name = dept_match.group(1) if dept_match else "ฝ่ายสินเชื่อ"
         
         # Extract date/time format
-        date_pattern = r'(\d{1,2}/\d{1,2}/\s*\d{1,2}:\d{1,2})'
-        date_match = re.search(date_pattern, html_content)
+        date_match = _DATE_RE.search(html_content)
         timestamp = date_match.group(1) if date_match else None
         
         # Extract waiting count
-        wait_pattern = r'รอ\s*(\d+)\s*คิว'
-        wait_match = re.search(wait_pattern, html_content)
+        wait_match = _WAIT_RE.search(html_content)
         waiting_count = f"{wait_match.group(1)}คิว" if wait_match else "20คิว"
         
         return {
@@ -239,6 +437,7 @@ class ThaiReceiptGenerator:
 
 # Direct test function
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     generator = ThaiReceiptGenerator()
     
     # Test receipt generation
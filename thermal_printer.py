@@ -7,7 +7,12 @@ This module provides direct USB communication with the thermal printer
 import usb.core
 import usb.util
 import time
-from PIL import Image, ImageOps
+import atexit
+import functools
+import logging
+import struct
+from PIL import Image
+import numpy as np
 import os
 
 # Import printer configuration
@@ -21,6 +26,15 @@ except ImportError:
     THAI_CODEPAGE = 20  # Thai code page 42
     THAI_CHAR_MODE = 49  # 3-pass mode
 
+# Child of the kiosk logger, so records share its handlers when run from the kiosk
+log = logging.getLogger("kiosk.printer")
+
+# Shown when the USB device can't be opened for lack of permissions
+_PERMISSION_HELP = ("This usually means:\n"
+                    "1. The udev rules are not set up correctly\n"
+                    "2. You need to run the program with sudo privileges\n"
+                    "Try running with sudo or check if the udev rules are properly installed.")
+
 # ESC/POS Commands
 ESC = 0x1B  # Escape
 GS = 0x1D   # Group Separator
@@ -60,11 +74,66 @@ CODEPAGE_THAI18 = [ESC, 0x74, 0x1A]  # Thai character code 18
 THAI_CHARACTER_MODE_3PASS = [FS, 0x45, 0x31]  # Thai character 3-pass printing mode
 THAI_CHARACTER_MODE_1PASS = [FS, 0x45, 0x30]  # Thai character 1-pass printing mode
 
+# Byte strings of the commands sent on every print, built once at import
+INIT_B = bytes(INIT)
+LINE_FEED_B = bytes(LINE_FEED)
+CUT_B = bytes(CUT)
+ALIGN_CENTER_B = bytes(ALIGN_CENTER)
+ALIGN_LEFT_B = bytes(ALIGN_LEFT)
+BOLD_ON_B = bytes(BOLD_ON)
+BOLD_OFF_B = bytes(BOLD_OFF)
+DOUBLE_HEIGHT_ON_B = bytes(DOUBLE_HEIGHT_ON)
+DOUBLE_HEIGHT_OFF_B = bytes(DOUBLE_HEIGHT_OFF)
+THAI_CHARACTER_MODE_3PASS_B = bytes(THAI_CHARACTER_MODE_3PASS)
+THAI_CHARACTER_MODE_1PASS_B = bytes(THAI_CHARACTER_MODE_1PASS)
+CODEPAGE_THAI42_B = bytes(CODEPAGE_THAI42)
+
+# GS v 0 raster header: command, mode, then bytes per line and line count (little endian)
+_RASTER_HEADER = struct.Struct('<4BHH')
+
+# A full separator line: 32 characters of the default font fill a 58mm line
+SEP_LINE_B = b"-" * 32
+
+# Line feed runs for feed_paper, indexed by line count (max 10 lines for safety)
+MAX_FEED_LINES = 10
+FEED_LINES_B = tuple(LINE_FEED_B * lines for lines in range(MAX_FEED_LINES + 1))
+
+@functools.lru_cache(maxsize=256)
+def _encode_thai(text):
+    """Encode receipt text for the printer; repeated titles and footers are encoded once"""
+    try:
+        # Always use UTF-8 for Thai text
+        return text.encode('utf-8', errors='replace')
+    except Exception as e:
+        log.error("Error encoding Thai text: %s", e)
+        # Fall back to basic encoding if UTF-8 fails
+        return text.encode('ascii', errors='replace')
+
+def _receipt_bytes(text):
+    """Receipt text as printer bytes; bytes are taken as already encoded"""
+    if isinstance(text, bytes):
+        return text
+    return _encode_thai(text)
+
+def _requires_connection(method):
+    """Connect on first use; the wrapped method returns False if the printer can't be reached"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.is_connected and not self.connect():
+            return False
+        return method(self, *args, **kwargs)
+    return wrapper
+
 class ThermalPrinter:
-    def __init__(self):
+    def __init__(self, chunk_size=65536):
         self.dev = None
         self.ep_out = None
+        self._write = None
         self.is_connected = False
+        # Largest single bulk write; rounded to the endpoint's packet size on connect
+        self.chunk_size = chunk_size
+        # Printer modes known to be in effect, so jobs can skip resending them
+        self._state = {'init': False, 'thai_mode': None, 'codepage': None}
     
     def connect(self):
         """Connect to the thermal printer"""
@@ -73,42 +142,36 @@ class ThermalPrinter:
             self.dev = usb.core.find(idVendor=VENDOR_ID, idProduct=PRODUCT_ID)
             
             if self.dev is None:
-                print("Printer not found! Make sure it's connected and powered on.")
+                log.error("Printer not found! Make sure it's connected and powered on.")
                 return False
             
             # Detach kernel driver if active
             if self.dev.is_kernel_driver_active(0):
                 try:
                     self.dev.detach_kernel_driver(0)
-                    print("Kernel driver detached successfully")
+                    log.info("Kernel driver detached successfully")
                 except usb.core.USBError as e:
                     if "Permission denied" in str(e) or "Access denied" in str(e):
-                        print("\nPermission denied accessing the printer. This usually means:")
-                        print("1. The udev rules are not set up correctly")
-                        print("2. You need to run the program with sudo privileges")
-                        print("\nTry running with sudo or check if the udev rules are properly installed.")
+                        log.error("Permission denied accessing the printer. %s", _PERMISSION_HELP)
                         return False
-                    print(f"Error detaching kernel driver: {e}")
+                    log.error("Error detaching kernel driver: %s", e)
                     return False
                 except Exception as e:
-                    print(f"Error detaching kernel driver: {e}")
+                    log.error("Error detaching kernel driver: %s", e)
                     return False
             
             # Set configuration
             try:
                 self.dev.set_configuration()
-                print("USB configuration set successfully")
+                log.info("USB configuration set successfully")
             except usb.core.USBError as e:
                 if "Permission denied" in str(e) or "Access denied" in str(e):
-                    print("\nPermission denied setting USB configuration. This usually means:")
-                    print("1. The udev rules are not set up correctly")
-                    print("2. You need to run the program with sudo privileges")
-                    print("\nTry running with sudo or check if the udev rules are properly installed.")
+                    log.error("Permission denied setting USB configuration. %s", _PERMISSION_HELP)
                     return False
-                print(f"Error setting configuration: {e}")
+                log.error("Error setting configuration: %s", e)
                 return False
             except Exception as e:
-                print(f"Error setting configuration: {e}")
+                log.error("Error setting configuration: %s", e)
                 return False
             
             # Get endpoint
@@ -121,217 +184,261 @@ class ThermalPrinter:
             )
             
             if self.ep_out is None:
-                print("Output endpoint not found!")
+                log.error("Output endpoint not found!")
                 return False
             
+            # Bound write method, saving an attribute lookup per write
+            self._write = self.ep_out.write
+            
+            # Keep bulk writes a whole number of USB packets
+            packet_size = self.ep_out.wMaxPacketSize or 64
+            self.chunk_size = max(packet_size, self.chunk_size // packet_size * packet_size)
+            
             # Initialize printer
-            self.ep_out.write(bytes(INIT))
+            self._reset_state()
+            self._write(INIT_B)
+            self._state['init'] = True
             self.is_connected = True
-            print("Successfully connected to thermal printer")
+            log.info("Successfully connected to thermal printer")
             return True
             
         except usb.core.USBError as e:
             if "Permission denied" in str(e) or "Access denied" in str(e):
-                print("\nPermission denied accessing the printer. This usually means:")
-                print("1. The udev rules are not set up correctly")
-                print("2. You need to run the program with sudo privileges")
-                print("\nTry running with sudo or check if the udev rules are properly installed.")
+                log.error("Permission denied accessing the printer. %s", _PERMISSION_HELP)
             else:
-                print(f"USB error connecting to printer: {e}")
+                log.error("USB error connecting to printer: %s", e)
             return False
         except Exception as e:
-            print(f"Error connecting to printer: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error connecting to printer: %s", e)
             return False
     
+    def ensure_connected(self):
+        """Connect on first use; a no-op while the USB handle is already open"""
+        if self.is_connected:
+            return True
+        return self.connect()
+    
     def disconnect(self):
         """Disconnect from the printer"""
         if self.dev:
             usb.util.dispose_resources(self.dev)
             self.is_connected = False
+        self._reset_state()
+    
+    def _write_failed(self, error):
+        """Recover after a failed job; a USB error drops the handle so the next job reconnects"""
+        if isinstance(error, usb.core.USBError):
+            # The printer was unplugged or power-cycled; the old handle is dead
+            self.disconnect()
+        else:
+            self._reset_state()
+    
+    def _reset_state(self):
+        """Forget the printer's modes; the next job sends INIT and sets them again"""
+        self._state.update(init=False, thai_mode=None, codepage=None)
     
+    def _set_modes(self, buf, thai_mode):
+        """Append the INIT, Thai mode and code table commands that aren't already in effect"""
+        state = self._state
+        if not state['init']:
+            buf += INIT_B
+            # ESC @ also restores the default character modes
+            state.update(init=True, thai_mode=None, codepage=None)
+        if state['thai_mode'] != thai_mode:
+            buf += thai_mode
+            state['thai_mode'] = thai_mode
+        if state['codepage'] != CODEPAGE_THAI42_B:
+            buf += CODEPAGE_THAI42_B
+            state['codepage'] = CODEPAGE_THAI42_B
+    
+    def _write_chunked(self, data):
+        """Write data to the printer in chunk_size pieces"""
+        # Slice the bytes themselves: PyUSB copies bytes in one go but
+        # converts a memoryview element by element
+        for start in range(0, len(data), self.chunk_size):
+            self._write(data[start:start + self.chunk_size])
+    
+    @_requires_connection
     def print_text(self, text):
         """Print text to the thermal printer"""
-        if not self.is_connected:
-            if not self.connect():
-                return False
-        
         try:
-            # Initialize printer
-            self.ep_out.write(bytes(INIT))
+            # Collect the whole job and send it in one USB transfer
+            buf = bytearray()
             
-            # Try Thai character mode for better Thai support
-            # Enable Thai 3-pass mode for better quality
-            self.ep_out.write(bytes(THAI_CHARACTER_MODE_3PASS))
-            
-            # Set Thai character code table
-            self.ep_out.write(bytes(CODEPAGE_THAI42))
+            # Initialize printer, try Thai 3-pass character mode for better quality
+            # and set the Thai character code table, unless they are already set
+            self._set_modes(buf, THAI_CHARACTER_MODE_3PASS_B)
             
             # Encode text using the configured encoding
             try:
-                print(f"Using {THAI_ENCODING} encoding")
-                encoded_text = text.encode(THAI_ENCODING, errors='replace')
-                self.ep_out.write(encoded_text)
+                log.debug("Using %s encoding", THAI_ENCODING)
+                buf += text.encode(THAI_ENCODING, errors='replace')
             except LookupError:
                 # If the configured encoding is not available, fall back to UTF-8
-                print(f"{THAI_ENCODING} encoding not available, falling back to UTF-8")
-                encoded_text = text.encode('utf-8', errors='replace')
-                self.ep_out.write(encoded_text)
+                log.warning("%s encoding not available, falling back to UTF-8", THAI_ENCODING)
+                buf += text.encode('utf-8', errors='replace')
             
-            self.ep_out.write(bytes(LINE_FEED))
+            buf += LINE_FEED_B
+            self._write(buf)
             return True
         except Exception as e:
-            print(f"Error printing text: {e}")
-            import traceback
-            traceback.print_exc()
+            self._write_failed(e)
+            log.exception("Error printing text: %s", e)
             return False
     
+    @_requires_connection
     def feed_paper(self, lines=1):
         """Feed paper by specified number of lines (default: 1)
         This method provides controlled paper feeding"""
-        if not self.is_connected:
-            if not self.connect():
-                return False
-        
         try:
-            # Feed only the specified number of lines
-            for _ in range(min(lines, 10)):  # Limit to max 10 lines for safety
-                self.ep_out.write(bytes(LINE_FEED))
+            # Feed only the specified number of lines, in one write
+            if lines > 0:
+                self._write(FEED_LINES_B[min(lines, MAX_FEED_LINES)])
             return True
         except Exception as e:
-            print(f"Error feeding paper: {e}")
+            self._write_failed(e)
+            log.error("Error feeding paper: %s", e)
             return False
     
+    @_requires_connection
     def print_receipt(self, title, content, footer=None, max_length=500):
         """Print a formatted receipt with controlled paper usage
+        title, content and footer may be str or pre-encoded bytes (e.g. SEP_LINE_B)
         max_length: Maximum content length to prevent excessive paper feed"""
-        if not self.is_connected:
-            if not self.connect():
-                return False
-        
         try:
-            # Initialize printer
-            self.ep_out.write(bytes(INIT))
+            # Build the whole receipt in one buffer and send it in a single USB transfer
+            buf = bytearray()
             
-            # Set Thai character mode (3-pass or 1-pass)
+            # Initialize printer, set Thai character mode (3-pass or 1-pass) and
+            # the Thai character code table, unless they are already set
             if THAI_CHAR_MODE == 49:  # 3-pass mode
-                self.ep_out.write(bytes(THAI_CHARACTER_MODE_3PASS))
+                self._set_modes(buf, THAI_CHARACTER_MODE_3PASS_B)
             else:  # 1-pass mode
-                self.ep_out.write(bytes(THAI_CHARACTER_MODE_1PASS))
-            
-            # Set Thai character code table
-            self.ep_out.write(bytes(CODEPAGE_THAI42))
+                self._set_modes(buf, THAI_CHARACTER_MODE_1PASS_B)
             
-            # Encoding function to handle Thai text
-            def encode_thai(text):
-                try:
-                    # Always use UTF-8 for Thai text
-                    return text.encode('utf-8', errors='replace')
-                except Exception as e:
-                    print(f"Error encoding Thai text: {e}")
-                    # Fall back to basic encoding if UTF-8 fails
-                    return text.encode('ascii', errors='replace')
+            # The receipt changes alignment and text styles, so the next job starts with INIT
+            self._state['init'] = False
             
             # Limit content length to prevent excessive paper feed
             if content and len(content) > max_length:
-                content = content[:max_length] + "\n[Content truncated to save paper]\n"
+                note = "\n[Content truncated to save paper]\n"
+                content = content[:max_length] + (note.encode() if isinstance(content, bytes) else note)
             
             # Center and bold the title
-            self.ep_out.write(bytes(ALIGN_CENTER))
-            self.ep_out.write(bytes(BOLD_ON))
-            self.ep_out.write(bytes(DOUBLE_HEIGHT_ON))
-            self.ep_out.write(encode_thai(title))
-            self.ep_out.write(bytes(LINE_FEED))
-            self.ep_out.write(bytes(DOUBLE_HEIGHT_OFF))
-            self.ep_out.write(bytes(BOLD_OFF))
-            self.ep_out.write(bytes(LINE_FEED))
+            buf += ALIGN_CENTER_B
+            buf += BOLD_ON_B
+            buf += DOUBLE_HEIGHT_ON_B
+            buf += _receipt_bytes(title)
+            buf += LINE_FEED_B
+            buf += DOUBLE_HEIGHT_OFF_B
+            buf += BOLD_OFF_B
+            buf += LINE_FEED_B
             
             # Print content with left alignment
-            self.ep_out.write(bytes(ALIGN_LEFT))
-            self.ep_out.write(encode_thai(content))
-            self.ep_out.write(bytes(LINE_FEED))
+            buf += ALIGN_LEFT_B
+            buf += _receipt_bytes(content)
+            buf += LINE_FEED_B
             
             # Print footer if provided
             if footer:
-                self.ep_out.write(bytes(ALIGN_CENTER))
-                self.ep_out.write(encode_thai(footer))
-                self.ep_out.write(bytes(LINE_FEED))
+                buf += ALIGN_CENTER_B
+                buf += _receipt_bytes(footer)
+                buf += LINE_FEED_B
             
             # Feed paper (limited) and cut
-            self.feed_paper(2)  # Feed only 2 lines before cutting
-            self.ep_out.write(bytes(CUT))
+            buf += FEED_LINES_B[2]  # Feed only 2 lines before cutting
+            buf += CUT_B
             
+            self._write(buf)
             return True
         except Exception as e:
-            print(f"Error printing receipt: {e}")
-            import traceback
-            traceback.print_exc()
+            self._write_failed(e)
+            log.exception("Error printing receipt: %s", e)
             return False
     
+    @_requires_connection
     def cut_paper(self):
         """Cut the paper"""
-        if not self.is_connected:
-            if not self.connect():
-                return False
-        
         try:
-            self.ep_out.write(bytes(CUT))
+            self._write(CUT_B)
             return True
         except Exception as e:
-            print(f"Error cutting paper: {e}")
+            self._write_failed(e)
+            log.error("Error cutting paper: %s", e)
             return False
             
-    def print_image(self, image_path):
-        """Print a PNG image using ESC/POS raster graphics"""
-        if not self.is_connected:
-            if not self.connect():
-                return False
+    @_requires_connection
+    def print_raster(self, width_bytes, height, data):
+        """Print packed 1-bit rows (1 = black dot) using ESC/POS raster graphics"""
         try:
-            # Open and process image
-            img = Image.open(image_path)
-            # Make sure black text on white background is preserved
-            img = img.convert('L')  # Convert to grayscale first
-            # Then threshold to pure black/white with control over threshold value
-            # Lower threshold = darker output (more black)
-            threshold = 200
-            img = img.point(lambda p: 255 if p > threshold else 0)
-            img = img.convert('1')  # Convert to 1-bit black and white
-            
-            # IMPORTANT: Invert the image for thermal printing
-            # In thermal printing, 1 = white (no heat), 0 = black (apply heat)
-            # We need to invert so black text appears black on paper
-            img = ImageOps.invert(img)
-            width, height = img.size
-            
-            # Width must be divisible by 8 for ESC/POS raster format
-            if width % 8 != 0:
-                # Pad the width to make it divisible by 8
-                new_width = (width // 8 + 1) * 8
-                new_img = Image.new('1', (new_width, height), 1)  # White background (1 = white in mode '1')
-                new_img.paste(img, (0, 0))
-                img = new_img
-                width = new_width
-            
-            # ESC/POS raster bit image command
-            # GS v 0 - Print raster bit image
-            # Parameters: 0, width/8 (bytes per line), height low byte, height high byte
-            self.ep_out.write(bytes([GS, 0x76, 0x30, 0x00, width // 8, 0x00, height & 0xFF, (height >> 8) & 0xFF]))
-            
-            # Send the actual image data
-            pixels = img.tobytes()
-            self.ep_out.write(pixels)
-            
+            # GS v 0 - Print raster bit image: mode 0, bytes per line, line count (little endian)
+            header = _raster_header(width_bytes, height)
             # Feed a bit of paper and cut
-            self.feed_paper(3)
-            self.cut_paper()
-            print(f"Image printed successfully: {image_path}")
+            tail = FEED_LINES_B[3] + CUT_B
+            
+            if len(data) <= self.chunk_size:
+                # A normal receipt: header, rows, feed and cut in one transfer
+                buf = bytearray(header)
+                buf += data
+                buf += tail
+                self._write(buf)
+            else:
+                # A tall image: send the rows in chunks straight from data rather
+                # than copying the whole raster into the command buffer first
+                self._write(header)
+                self._write_chunked(data)
+                self._write(tail)
             return True
         except Exception as e:
-            print(f"Error printing image: {e}")
-            import traceback
-            traceback.print_exc()
+            self._write_failed(e)
+            log.exception("Error printing raster: %s", e)
             return False
+            
+    @_requires_connection
+    def print_image(self, image_path):
+        """Print a PNG image (a path or an open file object) using ESC/POS raster graphics"""
+        try:
+            if isinstance(image_path, (str, bytes, os.PathLike)):
+                # Reprints of an unchanged file (a logo, say) reuse its packed raster
+                raster = _load_raster(image_path, os.path.getmtime(image_path))
+            else:
+                # File objects and in-memory buffers have no mtime to key a cache on
+                raster = _pack_image(image_path)
+        except Exception as e:
+            log.exception("Error printing image: %s", e)
+            return False
+        
+        if not self.print_raster(*raster):
+            return False
+        log.debug("Image printed successfully: %s", image_path)
+        return True
+
+
+def _raster_header(width_bytes, height):
+    """GS v 0 header for a raster of width_bytes x height, mode 0"""
+    return _RASTER_HEADER.pack(GS, 0x76, 0x30, 0x00, width_bytes, height)
+
+@functools.lru_cache(maxsize=8)
+def _load_raster(image_path, mtime):
+    """Packed raster of an image file, cached; mtime keys the cache"""
+    return _pack_image(image_path)
+
+def _pack_image(image):
+    """Threshold and pack an image (path or file object) as (width_bytes, height, data)"""
+    # Threshold with one NumPy comparison; lower threshold = darker output (more black)
+    # Dark pixels become 1 bits, since in thermal printing 1 = black (apply heat)
+    threshold = 200
+    with Image.open(image) as img:
+        if img.mode == '1':
+            # Already 1-bit: white pixels are True, so invert instead of thresholding
+            bits = ~np.asarray(img)
+        else:
+            bits = np.asarray(img.convert('L')) <= threshold
+    
+    # ESC/POS raster rows are whole bytes; packbits pads each row with white
+    packed = np.packbits(bits, axis=1)
+    height, width_bytes = packed.shape
+    return width_bytes, height, packed.tobytes()
 
 
 # Singleton instance
@@ -342,6 +449,8 @@ def get_printer():
     global _printer
     if _printer is None:
         _printer = ThermalPrinter()
+        # Keep the USB handle open across prints; release it once at exit
+        atexit.register(_printer.disconnect)
     return _printer
 
 
@@ -374,13 +483,12 @@ def test_printer():
             print("Failed to connect to printer.")
             return False
     except Exception as e:
-        print(f"Error in test_printer: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in test_printer: %s", e)
         return False
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Run a test print if this module is executed directly
     if test_printer():
         print("Test receipt printed successfully!")